@@ -1,20 +1,27 @@
+from typing import Optional
 from fastapi import HTTPException, Request
-from app.auth.jwt import verify_token
+from app.auth.jwt import token_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def get_current_admin(request: Request) -> dict:
-    """Dependency to verify admin JWT token"""
+def bearer_token(request: Request) -> Optional[str]:
+    """Token from the Authorization header, if any"""
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ")[1]
+
+
+async def get_current_admin(request: Request) -> dict:
+    """Dependency to verify admin JWT token"""
+    token = bearer_token(request)
+    if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    token = auth_header.split(" ")[1]
-    payload = verify_token(token)
+    payload = await token_cache.verify(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
     return payload
-
@@ -1,11 +1,19 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from app.config import settings
+from app.database import get_database
+import hashlib
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Digests of logged-out tokens, shared by every worker; a TTL index drops them at the token's exp
+REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -24,7 +32,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS)
     
-    to_encode.update({"exp": expire})
+    # jti keeps tokens issued within the same second distinct, so revoking one leaves the other valid
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
@@ -43,6 +52,117 @@ def verify_token(token: str) -> Optional[dict]:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
     except JWTError as e:
-        logger.error(f"JWT verification error: {e}")
+        # Expired or forged tokens are routine client errors, not server errors
+        logger.debug(f"JWT verification error: {e}")
         return None
 
+
+class VerifiedTokenCache:
+    """
+    Size-bounded LRU cache of verified token claims, plus revocations.
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    never kept in memory. A cache hit costs no decode and no round trip.
+
+    Logouts are remembered in process memory until the token's exp, after
+    which jwt.decode rejects the token anyway. With shared revocation they
+    are also stored in Mongo (revoked_tokens): a cache miss looks there
+    after decoding, and claims are cached for at most cache_ttl seconds, so
+    other workers and restarted ones stop accepting a logged-out token
+    within that time. If Mongo cannot be read, the decoded claims are
+    accepted (logout is best effort then, admin access keeps working).
+    """
+
+    def __init__(self, max_entries: int, cache_ttl: float, shared_revocation: bool):
+        self.max_entries = max_entries
+        self.cache_ttl = cache_ttl
+        self.shared_revocation = shared_revocation
+        self._claims: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def _revoked_elsewhere(self, key: str) -> bool:
+        try:
+            document = await get_database()[REVOKED_TOKENS_COLLECTION].find_one({"_id": key}, {"_id": 1})
+        except Exception as e:
+            logger.warning(f"Cannot read token revocations, accepting the token: {e}")
+            return False
+        return document is not None
+
+    async def verify(self, token: str) -> Optional[dict]:
+        """
+        Verified claims of a token, decoding it only on a cache miss
+
+        Returns:
+            Optional[dict]: Decoded token data or None if invalid, expired or revoked
+        """
+        now = time.time()
+        key = self.digest(token)
+        if key in self._revoked:
+            if self._revoked[key] > now:
+                return None
+            del self._revoked[key]
+
+        entry = self._claims.get(key)
+        if entry is not None:
+            cached_until, payload = entry
+            if cached_until > now:
+                self._claims.move_to_end(key)
+                return payload
+            del self._claims[key]
+
+        payload = verify_token(token)
+        if payload is None or "exp" not in payload:
+            return payload
+        if self.shared_revocation and await self._revoked_elsewhere(key):
+            self._remember_revoked(key, float(payload["exp"]))
+            return None
+        if self.max_entries > 0:
+            self._claims[key] = (min(float(payload["exp"]), now + self.cache_ttl), payload)
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+        return payload
+
+    def _remember_revoked(self, key: str, exp: float) -> None:
+        self._claims.pop(key, None)
+        self._revoked[key] = exp
+        # Forget revocations of tokens that have expired by now
+        now = time.time()
+        for expired in [digest for digest, expires in self._revoked.items() if expires <= now]:
+            del self._revoked[expired]
+
+    async def revoke(self, token: str) -> bool:
+        """
+        Reject a token from now on.
+
+        Returns:
+            bool: Whether the token was valid (and is now revoked)
+
+        Raises:
+            PyMongoError: If the shared revocation could not be stored;
+                this process rejects the token regardless
+        """
+        payload = await self.verify(token)
+        if payload is None:
+            return False
+        key = self.digest(token)
+        exp = float(payload.get("exp", time.time() + settings.JWT_EXPIRATION_HOURS * 3600))
+        self._remember_revoked(key, exp)
+        if self.shared_revocation:
+            await get_database()[REVOKED_TOKENS_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {"expires_at": datetime.utcfromtimestamp(exp)}},
+                upsert=True,
+            )
+        return True
+
+
+token_cache = VerifiedTokenCache(
+    max_entries=settings.JWT_CACHE_MAX_ENTRIES,
+    cache_ttl=settings.JWT_CACHE_TTL_SECONDS,
+    shared_revocation=settings.JWT_SHARED_REVOCATION,
+)
+
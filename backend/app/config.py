@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Union
 import os
 
 
@@ -7,11 +7,43 @@ class Settings(BaseSettings):
     # MongoDB Configuration
     MONGODB_URI: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017/ufm_db")
     DATABASE_NAME: str = "ufm_db"
+    # Connection pool and wire protocol (options given here override the same options in the URI)
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))  # connections kept warm
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))  # 0 = never close idle
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+    # Read preference of the public project/client routes, e.g. "secondaryPreferred"
+    MONGO_PUBLIC_READ_PREFERENCE: str = os.getenv("MONGO_PUBLIC_READ_PREFERENCE", "primary")
+    # Write concern per collection as "collection:w" pairs, w being a number or "majority"
+    MONGO_WRITE_CONCERNS: str = os.getenv(
+        "MONGO_WRITE_CONCERNS", "contacts:1,newsletters:1,projects:majority,clients:majority"
+    )
+
+    @property
+    def mongo_compressors_list(self) -> List[str]:
+        """Get wire compressors as a list"""
+        return [name.strip() for name in self.MONGO_COMPRESSORS.split(",") if name.strip()]
+
+    @property
+    def mongo_write_concerns(self) -> Dict[str, Union[int, str]]:
+        """Get write concerns as a {collection: w} dict"""
+        concerns = {}
+        for pair in self.MONGO_WRITE_CONCERNS.split(","):
+            if ":" not in pair:
+                continue
+            collection, w = (part.strip() for part in pair.split(":", 1))
+            concerns[collection] = int(w) if w.isdigit() else w
+        return concerns
     
     # JWT Configuration
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
+    JWT_CACHE_MAX_ENTRIES: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "1024"))  # verified tokens kept in memory
+    # Store logouts in Mongo so every worker honours them; other workers catch up within JWT_CACHE_TTL_SECONDS
+    JWT_SHARED_REVOCATION: bool = os.getenv("JWT_SHARED_REVOCATION", "true").lower() == "true"
+    JWT_CACHE_TTL_SECONDS: float = float(os.getenv("JWT_CACHE_TTL_SECONDS", "30"))
     
     # Admin Authentication
     ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
@@ -27,13 +59,109 @@ class Settings(BaseSettings):
     
     # File Upload Configuration
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "static/uploads")
-    MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))  # 10MB per image
+    MAX_REQUEST_SIZE: int = int(os.getenv("MAX_REQUEST_SIZE", str(11 * 1024 * 1024)))  # whole request body
     ALLOWED_EXTENSIONS: List[str] = ["jpg", "jpeg", "png", "gif", "webp"]
+    # Bulk admin endpoints (POST /api/admin/{projects,clients}/bulk)
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "200"))
+    BULK_MAX_REQUEST_SIZE: int = int(os.getenv("BULK_MAX_REQUEST_SIZE", str(200 * 1024 * 1024)))
     
     # Image Processing Configuration
     IMAGE_CROP_WIDTH: int = int(os.getenv("IMAGE_CROP_WIDTH", "450"))
     IMAGE_CROP_HEIGHT: int = int(os.getenv("IMAGE_CROP_HEIGHT", "350"))
-    
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", "85"))
+    IMAGE_MAX_PIXELS: int = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))  # decompression bomb guard
+    # Responsive variants: output widths and formats (AVIF needs pillow-avif-plugin)
+    IMAGE_VARIANT_WIDTHS: str = os.getenv("IMAGE_VARIANT_WIDTHS", "225,450,900")
+    IMAGE_VARIANT_FORMATS: str = os.getenv("IMAGE_VARIANT_FORMATS", "avif,webp,jpeg")
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))  # 0 = thread pool
+    IMAGE_JOB_TIMEOUT_SECONDS: float = float(os.getenv("IMAGE_JOB_TIMEOUT_SECONDS", "30"))
+    # Background image jobs (?async_processing=true on admin create/update)
+    IMAGE_JOB_WORKERS: int = int(os.getenv("IMAGE_JOB_WORKERS", "2"))
+    IMAGE_JOB_POLL_SECONDS: float = float(os.getenv("IMAGE_JOB_POLL_SECONDS", "5"))
+    IMAGE_JOB_MAX_ATTEMPTS: int = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "3"))
+    IMAGE_JOB_STAGING_DIR: str = os.getenv("IMAGE_JOB_STAGING_DIR", "staging")
+
+    # Uploaded Image Delivery
+    # "app" streams files from Python, "x-accel" hands them to nginx via X-Accel-Redirect
+    STATIC_DELIVERY_MODE: str = os.getenv("STATIC_DELIVERY_MODE", "app")
+    STATIC_ACCEL_PREFIX: str = os.getenv("STATIC_ACCEL_PREFIX", "/_protected_uploads")
+    STATIC_UPLOADS_MAX_AGE: int = int(os.getenv("STATIC_UPLOADS_MAX_AGE", str(365 * 24 * 3600)))
+
+    # Upload Garbage Collection (files no document references any more)
+    UPLOAD_GC_INTERVAL_SECONDS: float = float(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", "3600"))  # 0 = off
+    UPLOAD_GC_GRACE_SECONDS: float = float(os.getenv("UPLOAD_GC_GRACE_SECONDS", str(24 * 3600)))
+    UPLOAD_GC_MAX_DELETES: int = int(os.getenv("UPLOAD_GC_MAX_DELETES", "1000"))  # per sweep
+    UPLOAD_GC_DELETES_PER_SECOND: float = float(os.getenv("UPLOAD_GC_DELETES_PER_SECOND", "50"))
+
+    @property
+    def image_variant_widths(self) -> List[int]:
+        """Get responsive image widths as a list"""
+        return [int(width) for width in self.IMAGE_VARIANT_WIDTHS.split(",") if width.strip()]
+
+    @property
+    def image_variant_formats(self) -> List[str]:
+        """Get responsive image formats as a list"""
+        return [fmt.strip().lower() for fmt in self.IMAGE_VARIANT_FORMATS.split(",") if fmt.strip()]
+
+    # Content Cache Configuration (public project/client reads)
+    CONTENT_CACHE_TTL_SECONDS: int = int(os.getenv("CONTENT_CACHE_TTL_SECONDS", "300"))
+    CONTENT_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", "1024"))
+    # Invalidate other workers' caches on writes: "auto" (change streams, else polling),
+    # "change_stream", "poll" or "off"
+    CACHE_COHERENCE_MODE: str = os.getenv("CACHE_COHERENCE_MODE", "auto")
+    CACHE_COHERENCE_POLL_SECONDS: float = float(os.getenv("CACHE_COHERENCE_POLL_SECONDS", "1"))
+
+    # Newsletter membership cache (repeat subscribes answered without Mongo)
+    NEWSLETTER_MEMBERSHIP_CACHE_SIZE: int = int(os.getenv("NEWSLETTER_MEMBERSHIP_CACHE_SIZE", "100000"))
+
+    # Contact write-behind buffer (acknowledge after local journaling, insert in batches)
+    CONTACT_WRITE_BEHIND: bool = os.getenv("CONTACT_WRITE_BEHIND", "false").lower() == "true"
+    CONTACT_BUFFER_DIR: str = os.getenv("CONTACT_BUFFER_DIR", "contact_buffer")
+    CONTACT_BUFFER_MAX_PENDING: int = int(os.getenv("CONTACT_BUFFER_MAX_PENDING", "10000"))
+    CONTACT_BUFFER_BATCH_SIZE: int = int(os.getenv("CONTACT_BUFFER_BATCH_SIZE", "500"))
+    CONTACT_BUFFER_FLUSH_SECONDS: float = float(os.getenv("CONTACT_BUFFER_FLUSH_SECONDS", "1"))
+
+    # Rate Limiting: "METHOD /path=PER_IP/GLOBAL" requests per minute, ";"-separated
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_RULES: str = os.getenv(
+        "RATE_LIMIT_RULES",
+        "POST /api/contact=10/600;POST /api/newsletter=10/600;POST /api/admin/auth/login=10/100;* /api/seed=2/10",
+    )
+    RATE_LIMIT_STORE: str = os.getenv("RATE_LIMIT_STORE", "memory")  # "mongo" shares buckets across workers
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # in-memory buckets
+    # Proxies (IPs or CIDRs) whose X-Real-IP/X-Forwarded-For are believed; empty: use the peer address
+    RATE_LIMIT_TRUSTED_PROXIES: str = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")
+
+    @property
+    def rate_limit_trusted_proxies(self) -> List[str]:
+        """Get trusted proxy addresses as a list"""
+        return [proxy.strip() for proxy in self.RATE_LIMIT_TRUSTED_PROXIES.split(",") if proxy.strip()]
+
+    # Pagination Configuration
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+    # Export Configuration
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Response Compression
+    GZIP_MINIMUM_SIZE: int = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+    GZIP_COMPRESS_LEVEL: int = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+
+    # Metrics (Prometheus text format on /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Bearer token for scrapers; without it only an admin token can read /metrics
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Admin request profiling (X-Profile: sample|cprofile or ?__profile= with an admin token)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))  # oldest deleted beyond this
+    PROFILE_MAX_PER_MINUTE: int = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))  # per process
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "30"))  # sampling stops after this
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, WriteConcern
 from app.config import settings
+from app.utils.metrics import MongoCommandMetrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,10 +11,37 @@ class Database:
 
 db = Database()
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
 async def connect_to_mongo():
     """Create database connection"""
+    # Checked once here: get_read_database() runs on every public read
+    if settings.MONGO_PUBLIC_READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(
+            f"Unknown MONGO_PUBLIC_READ_PREFERENCE {settings.MONGO_PUBLIC_READ_PREFERENCE!r}, "
+            f"expected one of {', '.join(READ_PREFERENCES)}"
+        )
     try:
-        db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+        options = {
+            "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+            "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        }
+        if settings.MONGO_MAX_IDLE_TIME_MS:
+            options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+        if settings.mongo_compressors_list:
+            options["compressors"] = settings.mongo_compressors_list
+        if settings.METRICS_ENABLED:
+            options["event_listeners"] = [MongoCommandMetrics()]
+        # A client installed beforehand (the benchmarks' in-memory stand-in) is kept
+        if db.client is None:
+            db.client = AsyncIOMotorClient(settings.MONGODB_URI, **options)
         # Test connection
         await db.client.admin.command('ping')
         logger.info("Connected to MongoDB successfully")
@@ -30,3 +59,22 @@ def get_database():
     """Get database instance"""
     return db.client[settings.DATABASE_NAME]
 
+def get_read_database():
+    """
+    Get database instance for public read routes.
+
+    Uses MONGO_PUBLIC_READ_PREFERENCE, so with "secondaryPreferred" these
+    reads may trail recent writes by the replication lag.
+    """
+    return db.client.get_database(
+        settings.DATABASE_NAME,
+        read_preference=READ_PREFERENCES[settings.MONGO_PUBLIC_READ_PREFERENCE],
+    )
+
+def get_collection(name: str):
+    """Get a collection with its configured write concern (MONGO_WRITE_CONCERNS)"""
+    database = get_database()
+    w = settings.mongo_write_concerns.get(name)
+    if w is None:
+        return database[name]
+    return database.get_collection(name, write_concern=WriteConcern(w=w))
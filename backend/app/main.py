@@ -1,15 +1,29 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.openapi.utils import get_openapi
 from contextlib import asynccontextmanager
+import hmac
 import logging
 import os
 
-from app.database import connect_to_mongo, close_mongo_connection
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.utils.image_processor import image_engine, resolve_app_path
+from app.utils.image_jobs import image_job_queue
+from app.utils.upload_gc import upload_sweeper
+from app.utils.indexes import ensure_indexes
+from app.utils.membership import newsletter_members
+from app.utils.write_behind import contact_buffer
+from app.utils.coherence import cache_coherence
+from app.utils.body_limit import BodySizeLimitMiddleware
+from app.utils.rate_limit import RateLimitMiddleware, build_store, parse_rules
+from app.utils.static_delivery import UploadSkippingGZipMiddleware, UploadStaticFiles
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry
+from app.auth.dependencies import bearer_token, get_current_admin
 from app.config import settings
-from app.routers import projects, clients, contact, newsletter, admin, seed
+from app.routers import projects, clients, contact, newsletter, admin, seed, jobs, uploads, diagnostics, homepage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,10 +34,23 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    await ensure_indexes(get_database())
+    await newsletter_members.warm(get_database().newsletters)
+    await cache_coherence.start()
     # Create uploads directory
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    image_engine.start()
+    image_job_queue.start()
+    upload_sweeper.start()
+    if settings.CONTACT_WRITE_BEHIND:
+        await contact_buffer.start()
     yield
     # Shutdown
+    await contact_buffer.stop()
+    await upload_sweeper.stop()
+    await image_job_queue.stop()
+    await cache_coherence.stop()
+    await image_engine.shutdown()
     await close_mongo_connection()
 
 
@@ -64,6 +91,15 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+# Rate limiting (added before CORS, so 429 responses still carry CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=parse_rules(settings.RATE_LIMIT_RULES),
+        store=build_store(),
+        trusted_proxies=settings.rate_limit_trusted_proxies,
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -71,24 +107,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Next-Cursor", "Link", "Accept-Ranges", "Content-Range", "Retry-After", "X-Profile-Id", "X-Profile-Status"],
 )
 
+# Compress JSON and streamed exports on the wire (uploaded images pass through as they are)
+app.add_middleware(
+    UploadSkippingGZipMiddleware,
+    skip_prefixes=["/static/uploads"],
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+)
+
+# Reject oversized uploads while they are still arriving
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=settings.MAX_REQUEST_SIZE,
+    path_limits={
+        "/api/admin/projects/bulk": settings.BULK_MAX_REQUEST_SIZE,
+        "/api/admin/clients/bulk": settings.BULK_MAX_REQUEST_SIZE,
+    },
+)
+
+# Admin-requested profiling of single requests
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Request metrics (outermost, so rejected and rate-limited requests are counted too)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(projects.router)
 app.include_router(projects.admin_router)
 app.include_router(clients.router)
 app.include_router(clients.admin_router)
+app.include_router(homepage.router)
 app.include_router(contact.router)
 app.include_router(contact.admin_router)
 app.include_router(newsletter.router)
 app.include_router(newsletter.admin_router)
 app.include_router(admin.router)
+app.include_router(jobs.router)
+app.include_router(uploads.router)
+app.include_router(diagnostics.router)
 app.include_router(seed.router)
 
-# Mount static files for uploaded images
+# Mount static files for uploaded images (before /static so it takes precedence)
 static_dir = os.path.join(os.path.dirname(__file__), "static")
-uploads_dir = os.path.join(static_dir, "uploads")
+uploads_dir = resolve_app_path(settings.UPLOAD_DIR)
 os.makedirs(uploads_dir, exist_ok=True)
+app.mount(
+    "/static/uploads",
+    UploadStaticFiles(
+        directory=uploads_dir,
+        max_age=settings.STATIC_UPLOADS_MAX_AGE,
+        accel_prefix=settings.STATIC_ACCEL_PREFIX if settings.STATIC_DELIVERY_MODE == "x-accel" else None,
+    ),
+    name="uploads",
+)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
@@ -103,3 +179,13 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        """Metrics in the Prometheus text format (METRICS_TOKEN or an admin token)"""
+        token = bearer_token(request)
+        if not (settings.METRICS_TOKEN and token and hmac.compare_digest(token, settings.METRICS_TOKEN)):
+            await get_current_admin(request)
+        return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
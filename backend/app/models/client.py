@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from bson import ObjectId
 
@@ -12,6 +12,10 @@ class Client(BaseModel):
     
     id: Optional[str] = Field(default=None, validation_alias="_id")
     image_url: str
+    # {format: {width: url}} responsive variants, e.g. {"webp": {"450": "/static/uploads/..."}}
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    # "processing" or "failed" while a background image job owns the image
+    image_status: Optional[str] = None
     name: str
     description: str
     designation: str
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from app.auth.jwt import create_access_token
-from app.auth.dependencies import get_current_admin
+from app.auth.jwt import create_access_token, token_cache
+from app.auth.dependencies import bearer_token, get_current_admin
 from app.config import settings
 from datetime import timedelta
 import logging
@@ -58,7 +58,14 @@ async def verify_admin(current_admin: dict = Depends(get_current_admin)):
 
 
 @router.get("/auth/logout")
-async def logout():
-    """Logout endpoint (client-side token removal)"""
+async def logout(request: Request):
+    """Logout endpoint, revokes the bearer token if one is sent"""
+    token = bearer_token(request)
+    if token:
+        try:
+            await token_cache.revoke(token)
+        except Exception as e:
+            logger.error(f"Error revoking token: {e}")
+            raise HTTPException(status_code=503, detail="Logout failed, please retry")
     return {"message": "Logged out successfully"}
 
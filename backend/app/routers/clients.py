@@ -1,26 +1,57 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request, Query
+from typing import List, Optional
 from bson import ObjectId
-from app.database import get_database
+from datetime import datetime
+from app.database import get_collection, get_read_database
 from app.models.client import Client, ClientCreate, ClientUpdate
 from app.utils.image_processor import crop_and_save_image
+from app.utils.bulk import bulk_write_items, parse_items
+from app.utils.image_jobs import accepted_response, discard_staged_upload, queue_image_job, stage_upload
+from app.utils.cache import content_cache, list_tags, item_tags
+from app.utils.serialization import DocumentSerializer
+from app.utils.http_cache import LAST_MODIFIED_FIELDS, build_payload, conditional_response, last_modified_of
+from app.utils.pagination import fetch_page, pagination_headers, parse_cursor
 from app.auth.dependencies import get_current_admin
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+client_serializer = DocumentSerializer(Client)
+
 router = APIRouter(prefix="/api/clients", tags=["clients"])
 admin_router = APIRouter(prefix="/api/admin/clients", tags=["admin-clients"])
 
 
 @router.get("", response_model=List[Client])
-async def get_clients():
-    """Get all clients"""
+async def get_clients(
+    request: Request,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,image_url"),
+):
+    """Get clients, one page at a time"""
     try:
-        db = get_database()
-        clients = await db.clients.find().to_list(length=100)
-        return [Client(**client) for client in clients]
+        after_id = parse_cursor(after)
+        selected = client_serializer.select(fields)
+
+        async def load():
+            db = get_read_database()
+            clients, next_cursor = await fetch_page(
+                db.clients, limit, after_id, projection=client_serializer.projection(selected)
+            )
+            # ETag only: a delete never advances the newest created_at/updated_at of what is left
+            return build_payload(
+                client_serializer.rows(clients, selected),
+                headers=pagination_headers(request.url.path, limit, next_cursor, {"fields": fields}),
+            )
+
+        payload = await content_cache.get_or_load(
+            ("clients", "list", limit, after, selected), list_tags("clients"), load
+        )
+        return conditional_response(request, payload)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching clients: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch clients")
@@ -32,6 +63,7 @@ async def create_client(
     description: str = Form(...),
     designation: str = Form(...),
     image: UploadFile = File(...),
+    async_processing: bool = Query(False, description="Queue image processing and return 202 right away"),
     current_admin: dict = Depends(get_current_admin),
 ):
     """Create a new client (Admin only)"""
@@ -44,21 +76,42 @@ async def create_client(
                 detail=f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
             )
         
-        # Process and save image
-        image_url = await crop_and_save_image(image, image.filename)
+        if async_processing:
+            # Validate and stage the upload now, a background job fills in the image
+            job_id = await stage_upload(image)
+            image_fields = {"image_url": "", "image_status": "processing", "image_job_id": job_id}
+        else:
+            # Process and save image
+            processed_image = await crop_and_save_image(image, image.filename)
+            image_fields = {
+                "image_url": processed_image.image_url,
+                "image_variants": processed_image.variants,
+            }
         
         # Create client document
         client_data = {
             "name": name,
             "description": description,
             "designation": designation,
-            "image_url": image_url,
+            **image_fields,
+            "created_at": datetime.utcnow(),
         }
         
-        db = get_database()
-        result = await db.clients.insert_one(client_data)
-        client_data["_id"] = result.inserted_id
+        collection = get_collection("clients")
+        try:
+            result = await collection.insert_one(client_data)
+            client_data["_id"] = result.inserted_id
+            content_cache.invalidate("clients")
+            if async_processing:
+                await queue_image_job(job_id, "clients", result.inserted_id)
+        except Exception:
+            if async_processing:
+                # No job will ever pick the staged file up
+                await discard_staged_upload(job_id)
+            raise
         
+        if async_processing:
+            return accepted_response(Client(**client_data), job_id)
         return Client(**client_data)
     except HTTPException:
         raise
@@ -67,20 +120,50 @@ async def create_client(
         raise HTTPException(status_code=500, detail=f"Failed to create client: {str(e)}")
 
 
+@admin_router.post("/bulk")
+async def bulk_clients(
+    items: str = Form(..., description='JSON array of {"op": "create"|"update"|"delete", "id", "image", ...fields}'),
+    files: List[UploadFile] = File([]),
+    current_admin: dict = Depends(get_current_admin),
+):
+    """Create, update and delete many clients in one request (Admin only)"""
+    try:
+        return await bulk_write_items("clients", parse_items(items), files, ClientCreate, ClientUpdate)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk client write: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply bulk clients: {str(e)}")
+
+
 @router.get("/{client_id}", response_model=Client)
-async def get_client(client_id: str):
+async def get_client(
+    request: Request,
+    client_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,image_url"),
+):
     """Get a single client by ID"""
     try:
         if not ObjectId.is_valid(client_id):
             raise HTTPException(status_code=400, detail="Invalid client ID")
+        selected = client_serializer.select(fields)
         
-        db = get_database()
-        client = await db.clients.find_one({"_id": ObjectId(client_id)})
-        
-        if not client:
+        async def load():
+            db = get_read_database()
+            client = await db.clients.find_one(
+                {"_id": ObjectId(client_id)}, client_serializer.projection(selected, *LAST_MODIFIED_FIELDS)
+            )
+            if not client:
+                return None
+            return build_payload(client_serializer.row(client, selected), last_modified_of([client]))
+
+        payload = await content_cache.get_or_load(
+            ("clients", client_id, selected), item_tags("clients", client_id), load
+        )
+        if not payload:
             raise HTTPException(status_code=404, detail="Client not found")
         
-        return Client(**client)
+        return conditional_response(request, payload)
     except HTTPException:
         raise
     except Exception as e:
@@ -95,6 +178,7 @@ async def update_client(
     description: str = Form(None),
     designation: str = Form(None),
     image: UploadFile = File(None),
+    async_processing: bool = Query(False, description="Queue image processing and return 202 right away"),
     current_admin: dict = Depends(get_current_admin),
 ):
     """Update a client (Admin only)"""
@@ -102,8 +186,8 @@ async def update_client(
         if not ObjectId.is_valid(client_id):
             raise HTTPException(status_code=400, detail="Invalid client ID")
         
-        db = get_database()
-        client = await db.clients.find_one({"_id": ObjectId(client_id)})
+        collection = get_collection("clients")
+        client = await collection.find_one({"_id": ObjectId(client_id)})
         
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
@@ -123,18 +207,33 @@ async def update_client(
                     status_code=400,
                     detail=f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
                 )
-            # Process and save new image
-            image_url = await crop_and_save_image(image, image.filename)
-            update_data["image_url"] = image_url
+            if async_processing:
+                # Keep serving the current image until the job replaces it
+                job_id = await stage_upload(image)
+                update_data["image_status"] = "processing"
+                update_data["image_job_id"] = job_id
+            else:
+                # Process and save new image
+                processed_image = await crop_and_save_image(image, image.filename)
+                update_data["image_url"] = processed_image.image_url
+                update_data["image_variants"] = processed_image.variants
+                update_data["image_status"] = "ready"
+                # A job still running for an earlier upload must not overwrite this image
+                update_data["image_job_id"] = None
         
         if update_data:
-            await db.clients.update_one(
+            update_data["updated_at"] = datetime.utcnow()
+            await collection.update_one(
                 {"_id": ObjectId(client_id)},
                 {"$set": update_data}
             )
+            content_cache.invalidate("clients", client_id)
         
         # Fetch updated client
-        updated_client = await db.clients.find_one({"_id": ObjectId(client_id)})
+        updated_client = await collection.find_one({"_id": ObjectId(client_id)})
+        if image and async_processing:
+            await queue_image_job(job_id, "clients", ObjectId(client_id))
+            return accepted_response(Client(**updated_client), job_id)
         return Client(**updated_client)
     except HTTPException:
         raise
@@ -153,12 +252,13 @@ async def delete_client(
         if not ObjectId.is_valid(client_id):
             raise HTTPException(status_code=400, detail="Invalid client ID")
         
-        db = get_database()
-        result = await db.clients.delete_one({"_id": ObjectId(client_id)})
+        collection = get_collection("clients")
+        result = await collection.delete_one({"_id": ObjectId(client_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Client not found")
         
+        content_cache.invalidate("clients", client_id)
         return {"message": "Client deleted successfully"}
     except HTTPException:
         raise
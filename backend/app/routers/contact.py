@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from app.database import get_database
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Literal, Optional
+from datetime import datetime
+from app.database import get_collection, get_database
 from app.models.contact import Contact, ContactCreate
 from app.auth.dependencies import get_current_admin
+from app.utils.export import export_response
+from app.utils.serialization import DocumentSerializer, json_response
+from app.utils.write_behind import contact_buffer
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+contact_serializer = DocumentSerializer(Contact)
+
 router = APIRouter(prefix="/api/contact", tags=["contact"])
 admin_router = APIRouter(prefix="/api/admin/contacts", tags=["admin-contacts"])
 
@@ -15,24 +22,57 @@ admin_router = APIRouter(prefix="/api/admin/contacts", tags=["admin-contacts"])
 async def create_contact(contact: ContactCreate):
     """Submit contact form"""
     try:
-        db = get_database()
         contact_data = contact.dict()
-        result = await db.contacts.insert_one(contact_data)
+        contact_data["created_at"] = datetime.utcnow()
+        if settings.CONTACT_WRITE_BEHIND:
+            # Acknowledged once journaled locally, inserted with the next batch
+            contact_data = await contact_buffer.submit(contact_data)
+            return Contact(**contact_data)
+        
+        result = await get_collection("contacts").insert_one(contact_data)
         contact_data["_id"] = result.inserted_id
         return Contact(**contact_data)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating contact: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to submit contact form: {str(e)}")
 
 
 @admin_router.get("", response_model=List[Contact])
-async def get_contacts(current_admin: dict = Depends(get_current_admin)):
+async def get_contacts(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. email"),
+    current_admin: dict = Depends(get_current_admin),
+):
     """Get all contact form submissions (Admin only)"""
     try:
+        selected = contact_serializer.select(fields)
         db = get_database()
-        contacts = await db.contacts.find().sort("created_at", -1).to_list(length=1000)
-        return [Contact(**contact) for contact in contacts]
+        contacts = await db.contacts.find(
+            {}, contact_serializer.projection(selected)
+        ).sort("created_at", -1).to_list(length=1000)
+        return json_response(contact_serializer.rows(contacts, selected))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching contacts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch contacts")
 
+
+@admin_router.get("/export")
+async def export_contacts(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    current_admin: dict = Depends(get_current_admin),
+):
+    """Stream all contact form submissions as NDJSON or CSV (Admin only)"""
+    try:
+        db = get_database()
+        return export_response(
+            db.contacts,
+            list(Contact.model_fields),
+            format,
+            f"contacts-{datetime.utcnow():%Y%m%d}",
+        )
+    except Exception as e:
+        logger.error(f"Error exporting contacts: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export contacts")
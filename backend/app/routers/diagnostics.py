@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import FileResponse
+from app.database import get_database
+from app.utils.indexes import explain_queries
+from app.utils.profiling import list_profiles, profile_path
+from app.auth.dependencies import get_current_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/diagnostics", tags=["admin-diagnostics"])
+
+
+@router.get("/query-plans")
+async def get_query_plans(current_admin: dict = Depends(get_current_admin)):
+    """Explain every router query and list the ones doing a collection scan (Admin only)"""
+    try:
+        db = get_database()
+        return await explain_queries(db)
+    except Exception as e:
+        logger.error(f"Error explaining queries: {e}")
+        raise HTTPException(status_code=500, detail="Failed to explain queries")
+
+
+@router.get("/profiles")
+async def get_profiles(current_admin: dict = Depends(get_current_admin)):
+    """List stored request profiles, newest first (Admin only)"""
+    try:
+        return list_profiles()
+    except Exception as e:
+        logger.error(f"Error listing profiles: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list profiles")
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, current_admin: dict = Depends(get_current_admin)):
+    """Download a stored profile: folded stacks (.folded) or pstats (.prof) (Admin only)"""
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain" if profile_id.endswith(".folded") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=profile_id)
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Request, Query
+from typing import Optional
+from app.database import get_read_database
+from app.models.project import Project
+from app.models.client import Client
+from app.utils.cache import content_cache, list_tags
+from app.utils.serialization import DocumentSerializer
+from app.utils.http_cache import build_payload, conditional_response
+from app.utils.pagination import fetch_page
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sections the homepage can include, in response order
+SECTIONS = {
+    "projects": DocumentSerializer(Project),
+    "clients": DocumentSerializer(Client),
+}
+
+router = APIRouter(prefix="/api/homepage", tags=["homepage"])
+
+
+def parse_include(include: Optional[str]) -> tuple:
+    """Validate ?include=, defaulting to every section"""
+    if include is None:
+        return tuple(SECTIONS)
+    requested = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = requested - set(SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sections: {', '.join(sorted(unknown))}. Allowed: {', '.join(SECTIONS)}",
+        )
+    if not requested:
+        raise HTTPException(status_code=400, detail=f"include is empty. Allowed: {', '.join(SECTIONS)}")
+    return tuple(name for name in SECTIONS if name in requested)
+
+
+@router.get("")
+async def get_homepage(
+    request: Request,
+    include: Optional[str] = Query(None, description="Comma-separated sections, e.g. projects,clients (default: all)"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+):
+    """Get everything the landing page renders in one response"""
+    try:
+        sections = parse_include(include)
+
+        async def load():
+            db = get_read_database()
+            pages = await asyncio.gather(*(fetch_page(db[name], limit, None) for name in sections))
+            content = {
+                name: SECTIONS[name].rows(documents)
+                for name, (documents, _) in zip(sections, pages)
+            }
+            # Cursors for sections with more documents, to continue on the list endpoints
+            content["next_cursors"] = {
+                name: next_cursor for name, (_, next_cursor) in zip(sections, pages) if next_cursor
+            }
+            # ETag only, as on the list routes
+            return build_payload(content, precompress=True)
+
+        tags = {tag for name in sections for tag in list_tags(name)}
+        payload = await content_cache.get_or_load(("homepage", sections, limit), tags, load)
+        return conditional_response(request, payload)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching homepage: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch homepage")
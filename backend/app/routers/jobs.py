@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends
+from bson import ObjectId
+from app.utils.image_jobs import get_job_status
+from app.auth.dependencies import get_current_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/image-jobs", tags=["admin-image-jobs"])
+
+
+@router.get("/{job_id}")
+async def get_image_job(
+    job_id: str,
+    current_admin: dict = Depends(get_current_admin),
+):
+    """Get the status of a background image-processing job (Admin only)"""
+    try:
+        if not ObjectId.is_valid(job_id):
+            raise HTTPException(status_code=400, detail="Invalid job ID")
+        
+        job = await get_job_status(ObjectId(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching image job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch image job")
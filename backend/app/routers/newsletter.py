@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from app.database import get_database
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Literal, Optional
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import get_collection, get_database
 from app.models.newsletter import Newsletter, NewsletterCreate
 from app.auth.dependencies import get_current_admin
+from app.utils.export import export_response
+from app.utils.serialization import DocumentSerializer, json_response
+from app.utils.membership import newsletter_members
 import logging
 
 logger = logging.getLogger(__name__)
 
+newsletter_serializer = DocumentSerializer(Newsletter)
+
 router = APIRouter(prefix="/api/newsletter", tags=["newsletter"])
 admin_router = APIRouter(prefix="/api/admin/newsletters", tags=["admin-newsletters"])
 
@@ -15,16 +23,29 @@ admin_router = APIRouter(prefix="/api/admin/newsletters", tags=["admin-newslette
 async def subscribe_newsletter(newsletter: NewsletterCreate):
     """Subscribe to newsletter"""
     try:
-        db = get_database()
-        
-        # Check if email already exists
-        existing = await db.newsletters.find_one({"email": newsletter.email})
+        # Repeat subscribes are answered from memory
+        existing = newsletter_members.get(newsletter.email)
         if existing:
             return Newsletter(**existing)
         
-        newsletter_data = newsletter.dict()
-        result = await db.newsletters.insert_one(newsletter_data)
-        newsletter_data["_id"] = result.inserted_id
+        newsletters = get_collection("newsletters")
+        
+        # Insert-if-absent in one round trip; the unique email index makes it race-free
+        for attempt in range(2):
+            try:
+                newsletter_data = await newsletters.find_one_and_update(
+                    {"email": newsletter.email},
+                    {"$setOnInsert": {"email": newsletter.email, "subscribed_at": datetime.utcnow()}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+                break
+            except DuplicateKeyError:
+                # A concurrent upsert inserted it first, the retry matches that document
+                if attempt:
+                    raise
+        
+        newsletter_members.add(newsletter_data)
         return Newsletter(**newsletter_data)
     except Exception as e:
         logger.error(f"Error subscribing to newsletter: {e}")
@@ -32,13 +53,39 @@ async def subscribe_newsletter(newsletter: NewsletterCreate):
 
 
 @admin_router.get("", response_model=List[Newsletter])
-async def get_newsletters(current_admin: dict = Depends(get_current_admin)):
+async def get_newsletters(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. email"),
+    current_admin: dict = Depends(get_current_admin),
+):
     """Get all newsletter subscriptions (Admin only)"""
     try:
+        selected = newsletter_serializer.select(fields)
         db = get_database()
-        newsletters = await db.newsletters.find().sort("subscribed_at", -1).to_list(length=1000)
-        return [Newsletter(**newsletter) for newsletter in newsletters]
+        newsletters = await db.newsletters.find(
+            {}, newsletter_serializer.projection(selected)
+        ).sort("subscribed_at", -1).to_list(length=1000)
+        return json_response(newsletter_serializer.rows(newsletters, selected))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching newsletters: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch newsletters")
 
+
+@admin_router.get("/export")
+async def export_newsletters(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    current_admin: dict = Depends(get_current_admin),
+):
+    """Stream all newsletter subscriptions as NDJSON or CSV (Admin only)"""
+    try:
+        db = get_database()
+        return export_response(
+            db.newsletters,
+            list(Newsletter.model_fields),
+            format,
+            f"newsletters-{datetime.utcnow():%Y%m%d}",
+        )
+    except Exception as e:
+        logger.error(f"Error exporting newsletters: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export newsletters")
@@ -1,26 +1,57 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request, Query
+from typing import List, Optional
 from bson import ObjectId
-from app.database import get_database
+from datetime import datetime
+from app.database import get_collection, get_read_database
 from app.models.project import Project, ProjectCreate, ProjectUpdate
 from app.utils.image_processor import crop_and_save_image
+from app.utils.bulk import bulk_write_items, parse_items
+from app.utils.image_jobs import accepted_response, discard_staged_upload, queue_image_job, stage_upload
+from app.utils.cache import content_cache, list_tags, item_tags
+from app.utils.serialization import DocumentSerializer
+from app.utils.http_cache import LAST_MODIFIED_FIELDS, build_payload, conditional_response, last_modified_of
+from app.utils.pagination import fetch_page, pagination_headers, parse_cursor
 from app.auth.dependencies import get_current_admin
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+project_serializer = DocumentSerializer(Project)
+
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 admin_router = APIRouter(prefix="/api/admin/projects", tags=["admin-projects"])
 
 
 @router.get("", response_model=List[Project])
-async def get_projects():
-    """Get all projects"""
+async def get_projects(
+    request: Request,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,image_url"),
+):
+    """Get projects, one page at a time"""
     try:
-        db = get_database()
-        projects = await db.projects.find().to_list(length=100)
-        return [Project(**project) for project in projects]
+        after_id = parse_cursor(after)
+        selected = project_serializer.select(fields)
+
+        async def load():
+            db = get_read_database()
+            projects, next_cursor = await fetch_page(
+                db.projects, limit, after_id, projection=project_serializer.projection(selected)
+            )
+            # ETag only: a delete never advances the newest created_at/updated_at of what is left
+            return build_payload(
+                project_serializer.rows(projects, selected),
+                headers=pagination_headers(request.url.path, limit, next_cursor, {"fields": fields}),
+            )
+
+        payload = await content_cache.get_or_load(
+            ("projects", "list", limit, after, selected), list_tags("projects"), load
+        )
+        return conditional_response(request, payload)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching projects: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch projects")
@@ -31,6 +62,7 @@ async def create_project(
     name: str = Form(...),
     description: str = Form(...),
     image: UploadFile = File(...),
+    async_processing: bool = Query(False, description="Queue image processing and return 202 right away"),
     current_admin: dict = Depends(get_current_admin),
 ):
     """Create a new project (Admin only)"""
@@ -43,20 +75,41 @@ async def create_project(
                 detail=f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
             )
         
-        # Process and save image
-        image_url = await crop_and_save_image(image, image.filename)
+        if async_processing:
+            # Validate and stage the upload now, a background job fills in the image
+            job_id = await stage_upload(image)
+            image_fields = {"image_url": "", "image_status": "processing", "image_job_id": job_id}
+        else:
+            # Process and save image
+            processed_image = await crop_and_save_image(image, image.filename)
+            image_fields = {
+                "image_url": processed_image.image_url,
+                "image_variants": processed_image.variants,
+            }
         
         # Create project document
         project_data = {
             "name": name,
             "description": description,
-            "image_url": image_url,
+            **image_fields,
+            "created_at": datetime.utcnow(),
         }
         
-        db = get_database()
-        result = await db.projects.insert_one(project_data)
-        project_data["_id"] = result.inserted_id
+        collection = get_collection("projects")
+        try:
+            result = await collection.insert_one(project_data)
+            project_data["_id"] = result.inserted_id
+            content_cache.invalidate("projects")
+            if async_processing:
+                await queue_image_job(job_id, "projects", result.inserted_id)
+        except Exception:
+            if async_processing:
+                # No job will ever pick the staged file up
+                await discard_staged_upload(job_id)
+            raise
         
+        if async_processing:
+            return accepted_response(Project(**project_data), job_id)
         return Project(**project_data)
     except HTTPException:
         raise
@@ -65,20 +118,50 @@ async def create_project(
         raise HTTPException(status_code=500, detail=f"Failed to create project: {str(e)}")
 
 
+@admin_router.post("/bulk")
+async def bulk_projects(
+    items: str = Form(..., description='JSON array of {"op": "create"|"update"|"delete", "id", "image", ...fields}'),
+    files: List[UploadFile] = File([]),
+    current_admin: dict = Depends(get_current_admin),
+):
+    """Create, update and delete many projects in one request (Admin only)"""
+    try:
+        return await bulk_write_items("projects", parse_items(items), files, ProjectCreate, ProjectUpdate)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk project write: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply bulk projects: {str(e)}")
+
+
 @router.get("/{project_id}", response_model=Project)
-async def get_project(project_id: str):
+async def get_project(
+    request: Request,
+    project_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,image_url"),
+):
     """Get a single project by ID"""
     try:
         if not ObjectId.is_valid(project_id):
             raise HTTPException(status_code=400, detail="Invalid project ID")
+        selected = project_serializer.select(fields)
         
-        db = get_database()
-        project = await db.projects.find_one({"_id": ObjectId(project_id)})
-        
-        if not project:
+        async def load():
+            db = get_read_database()
+            project = await db.projects.find_one(
+                {"_id": ObjectId(project_id)}, project_serializer.projection(selected, *LAST_MODIFIED_FIELDS)
+            )
+            if not project:
+                return None
+            return build_payload(project_serializer.row(project, selected), last_modified_of([project]))
+
+        payload = await content_cache.get_or_load(
+            ("projects", project_id, selected), item_tags("projects", project_id), load
+        )
+        if not payload:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        return Project(**project)
+        return conditional_response(request, payload)
     except HTTPException:
         raise
     except Exception as e:
@@ -92,6 +175,7 @@ async def update_project(
     name: str = Form(None),
     description: str = Form(None),
     image: UploadFile = File(None),
+    async_processing: bool = Query(False, description="Queue image processing and return 202 right away"),
     current_admin: dict = Depends(get_current_admin),
 ):
     """Update a project (Admin only)"""
@@ -99,8 +183,8 @@ async def update_project(
         if not ObjectId.is_valid(project_id):
             raise HTTPException(status_code=400, detail="Invalid project ID")
         
-        db = get_database()
-        project = await db.projects.find_one({"_id": ObjectId(project_id)})
+        collection = get_collection("projects")
+        project = await collection.find_one({"_id": ObjectId(project_id)})
         
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
@@ -118,18 +202,33 @@ async def update_project(
                     status_code=400,
                     detail=f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
                 )
-            # Process and save new image
-            image_url = await crop_and_save_image(image, image.filename)
-            update_data["image_url"] = image_url
+            if async_processing:
+                # Keep serving the current image until the job replaces it
+                job_id = await stage_upload(image)
+                update_data["image_status"] = "processing"
+                update_data["image_job_id"] = job_id
+            else:
+                # Process and save new image
+                processed_image = await crop_and_save_image(image, image.filename)
+                update_data["image_url"] = processed_image.image_url
+                update_data["image_variants"] = processed_image.variants
+                update_data["image_status"] = "ready"
+                # A job still running for an earlier upload must not overwrite this image
+                update_data["image_job_id"] = None
         
         if update_data:
-            await db.projects.update_one(
+            update_data["updated_at"] = datetime.utcnow()
+            await collection.update_one(
                 {"_id": ObjectId(project_id)},
                 {"$set": update_data}
             )
+            content_cache.invalidate("projects", project_id)
         
         # Fetch updated project
-        updated_project = await db.projects.find_one({"_id": ObjectId(project_id)})
+        updated_project = await collection.find_one({"_id": ObjectId(project_id)})
+        if image and async_processing:
+            await queue_image_job(job_id, "projects", ObjectId(project_id))
+            return accepted_response(Project(**updated_project), job_id)
         return Project(**updated_project)
     except HTTPException:
         raise
@@ -148,12 +247,13 @@ async def delete_project(
         if not ObjectId.is_valid(project_id):
             raise HTTPException(status_code=400, detail="Invalid project ID")
         
-        db = get_database()
-        result = await db.projects.delete_one({"_id": ObjectId(project_id)})
+        collection = get_collection("projects")
+        result = await collection.delete_one({"_id": ObjectId(project_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Project not found")
         
+        content_cache.invalidate("projects", project_id)
         return {"message": "Project deleted successfully"}
     except HTTPException:
         raise
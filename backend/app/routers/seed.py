@@ -3,6 +3,7 @@ Seed endpoint for populating database
 """
 from fastapi import APIRouter, HTTPException
 from app.database import get_database
+from app.utils.cache import content_cache
 from datetime import datetime
 import logging
 
@@ -105,6 +106,8 @@ async def populate_seed_data():
             result = await db.clients.insert_many(clients)
             clients_inserted = len(result.inserted_ids)
         
+        content_cache.clear()
+        
         return {
             "message": "Seed data populated successfully",
             "projects_inserted": projects_inserted,
@@ -202,6 +205,7 @@ async def reset_and_reseed():
         
         await db.projects.insert_many(projects)
         await db.clients.insert_many(clients)
+        content_cache.clear()
         
         return {
             "message": "Database reset and reseeded successfully",
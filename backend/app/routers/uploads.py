@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends
+from dataclasses import asdict
+from app.utils.upload_gc import upload_sweeper
+from app.auth.dependencies import get_current_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/uploads", tags=["admin-uploads"])
+
+
+@router.get("/orphans")
+async def get_orphaned_uploads(current_admin: dict = Depends(get_current_admin)):
+    """Dry-run report of upload files the sweeper would delete (Admin only)"""
+    try:
+        report = await upload_sweeper.sweep(dry_run=True)
+        return asdict(report)
+    except Exception as e:
+        logger.error(f"Error scanning uploads: {e}")
+        raise HTTPException(status_code=500, detail="Failed to scan uploads")
+
+
+@router.post("/sweep")
+async def sweep_uploads(current_admin: dict = Depends(get_current_admin)):
+    """Delete orphaned upload files now instead of waiting for the schedule (Admin only)"""
+    try:
+        report = await upload_sweeper.sweep()
+        return asdict(report)
+    except Exception as e:
+        logger.error(f"Error sweeping uploads: {e}")
+        raise HTTPException(status_code=500, detail="Failed to sweep uploads")
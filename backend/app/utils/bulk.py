@@ -0,0 +1,227 @@
+"""
+Bulk create/update/delete of image-backed documents (projects, clients)
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.database import get_collection
+from app.utils.cache import content_cache
+from app.utils.image_processor import ProcessedImage, crop_and_save_image
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+BULK_OPS = ("create", "update", "delete")
+
+
+class _ItemError(Exception):
+    def __init__(self, status: int, error: str):
+        self.status = status
+        self.error = error
+
+
+def parse_items(items: str) -> List[dict]:
+    """
+    Parse the JSON "items" form field.
+
+    Raises:
+        HTTPException: 400 if it is not a JSON array of objects or has too many items
+    """
+    try:
+        parsed = json.loads(items)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="items must be a JSON array")
+    if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+        raise HTTPException(status_code=400, detail="items must be a JSON array of objects")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="items is empty")
+    if len(parsed) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items. Maximum is {settings.BULK_MAX_ITEMS}")
+    return parsed
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+def _image_file(item: dict, files: Dict[str, UploadFile], required: bool) -> Optional[UploadFile]:
+    name = item.get("image")
+    if name is None:
+        if required:
+            raise _ItemError(400, "image is required")
+        return None
+    extension = name.split(".")[-1].lower()
+    if extension not in settings.ALLOWED_EXTENSIONS:
+        raise _ItemError(400, f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}")
+    if name not in files:
+        raise _ItemError(400, f"No uploaded file named {name!r}")
+    return files[name]
+
+
+async def _process_images(uploads: Dict[str, UploadFile]) -> Dict[str, Any]:
+    """Process every referenced upload once, concurrently, bounded by the image workers"""
+    semaphore = asyncio.Semaphore(max(1, settings.IMAGE_WORKERS))
+
+    async def process(upload: UploadFile) -> ProcessedImage:
+        async with semaphore:
+            return await crop_and_save_image(upload, upload.filename)
+
+    names = list(uploads)
+    results = await asyncio.gather(*(process(uploads[name]) for name in names), return_exceptions=True)
+    return dict(zip(names, results))
+
+
+async def bulk_write_items(
+    collection_name: str,
+    items: List[dict],
+    files: List[UploadFile],
+    create_model: Type[BaseModel],
+    update_model: Type[BaseModel],
+) -> Dict[str, Any]:
+    """
+    Apply a batch of create/update/delete items with one bulk_write.
+
+    Each item is {"op": "create"|"update"|"delete", "id": ... (update/delete),
+    "image": <uploaded file name> (required for create), ...model fields}.
+    Items are validated independently, so one bad item only fails itself.
+    Referenced images are processed concurrently, each distinct file once,
+    and all writes go to Mongo as a single unordered bulk_write.
+
+    Args:
+        collection_name: "projects" or "clients"
+        items: Parsed "items" field
+        files: Uploaded files, referenced from items by file name
+        create_model: Model validating create fields
+        update_model: Model validating update fields
+
+    Returns:
+        dict: Per-item results ({index, op, id, status, error}) and counts per outcome
+    """
+    collection = get_collection(collection_name)
+    files_by_name = {upload.filename: upload for upload in files if upload.filename}
+    results: List[Dict[str, Any]] = [
+        {"index": index, "op": item.get("op"), "id": item.get("id"), "status": None, "error": None}
+        for index, item in enumerate(items)
+    ]
+
+    def fail(index: int, status: int, error: str):
+        results[index]["status"] = status
+        results[index]["error"] = error
+
+    # Validate every item and collect the uploads it needs
+    planned: Dict[int, Dict[str, Any]] = {}
+    for index, item in enumerate(items):
+        try:
+            op = item.get("op")
+            if op not in BULK_OPS:
+                raise _ItemError(400, f"op must be one of {', '.join(BULK_OPS)}")
+            fields = {key: value for key, value in item.items() if key not in ("op", "id", "image")}
+            plan: Dict[str, Any] = {"op": op}
+            if op != "create":
+                if not isinstance(item.get("id"), str) or not ObjectId.is_valid(item["id"]):
+                    raise _ItemError(400, "Invalid or missing id")
+                plan["_id"] = ObjectId(item["id"])
+            if op == "create":
+                plan["fields"] = create_model(**fields).model_dump()
+                plan["image"] = _image_file(item, files_by_name, required=True)
+            elif op == "update":
+                plan["fields"] = update_model(**fields).model_dump(exclude_none=True)
+                plan["image"] = _image_file(item, files_by_name, required=False)
+                if not plan["fields"] and plan["image"] is None:
+                    raise _ItemError(400, "Nothing to update")
+            planned[index] = plan
+        except _ItemError as e:
+            fail(index, e.status, e.error)
+        except ValidationError as e:
+            fail(index, 400, _validation_message(e))
+
+    # Updates and deletes must point at existing documents
+    target_ids = {plan["_id"] for plan in planned.values() if "_id" in plan}
+    if target_ids:
+        existing = {
+            document["_id"]
+            async for document in collection.find({"_id": {"$in": list(target_ids)}}, {"_id": 1})
+        }
+        for index, plan in list(planned.items()):
+            if "_id" in plan and plan["_id"] not in existing:
+                fail(index, 404, "Not found")
+                del planned[index]
+
+    uploads = {plan["image"].filename: plan["image"] for plan in planned.values() if plan.get("image")}
+    processed = await _process_images(uploads)
+
+    # Build the write batch
+    now = datetime.utcnow()
+    operations = []
+    operation_items: List[int] = []
+    for index, plan in planned.items():
+        image_fields = {}
+        if plan.get("image") is not None:
+            outcome = processed[plan["image"].filename]
+            if isinstance(outcome, Exception):
+                status = outcome.status_code if isinstance(outcome, HTTPException) else 500
+                fail(index, status, getattr(outcome, "detail", None) or str(outcome))
+                continue
+            image_fields = {"image_url": outcome.image_url, "image_variants": outcome.variants}
+
+        if plan["op"] == "create":
+            document_id = ObjectId()
+            operations.append(InsertOne({
+                "_id": document_id,
+                **plan["fields"],
+                **image_fields,
+                "created_at": now,
+            }))
+            results[index]["id"] = str(document_id)
+        elif plan["op"] == "update":
+            operations.append(UpdateOne(
+                {"_id": plan["_id"]},
+                {"$set": {
+                    **plan["fields"],
+                    **image_fields,
+                    **({"image_status": "ready", "image_job_id": None} if image_fields else {}),
+                    "updated_at": now,
+                }},
+            ))
+        else:
+            operations.append(DeleteOne({"_id": plan["_id"]}))
+        operation_items.append(index)
+
+    write_errors: Dict[int, str] = {}
+    if operations:
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                write_errors[error["index"]] = error.get("errmsg", "Write failed")
+        except Exception as e:
+            logger.error(f"Error in bulk write to {collection_name}: {e}")
+            for position in range(len(operations)):
+                write_errors[position] = "Write failed"
+
+    for position, index in enumerate(operation_items):
+        if position in write_errors:
+            fail(index, 500, write_errors[position])
+        else:
+            results[index]["status"] = 201 if planned[index]["op"] == "create" else 200
+
+    # Invalidate cached reads
+    content_cache.invalidate(collection_name)
+    for position, index in enumerate(operation_items):
+        if position not in write_errors and planned[index]["op"] != "create":
+            content_cache.invalidate(collection_name, str(planned[index]["_id"]))
+
+    counts = {op: 0 for op in ("created", "updated", "deleted", "failed")}
+    for result in results:
+        if result["error"] is not None:
+            counts["failed"] += 1
+        else:
+            counts[{"create": "created", "update": "updated", "delete": "deleted"}[result["op"]]] += 1
+    return {**counts, "results": results}
@@ -0,0 +1,182 @@
+"""
+In-process read cache for public content
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from app.config import settings
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """
+    Size-bounded LRU cache with TTL and tag-based versioning.
+
+    Every entry is stored together with the versions of the tags it depends on
+    at the moment the load *started*. Invalidating a tag bumps its version, so
+    any entry that depended on it (including one whose load was still in
+    flight when the write happened) is treated as a miss on the next read.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, int], Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def _snapshot(self, tags: Iterable[str]) -> Dict[str, int]:
+        return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key
+
+        Returns:
+            Tuple[bool, Any]: (found, value)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, versions, value = entry
+        if expires_at < time.monotonic() or any(
+            self._versions.get(tag, 0) != version for tag, version in versions.items()
+        ):
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, versions: Dict[str, int]) -> None:
+        """Store a value loaded while the given tag versions were current"""
+        if self.max_entries <= 0:
+            return
+        if versions != self._snapshot(versions):
+            # A write happened while the value was being loaded
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, versions, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        tags: Iterable[str],
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Return the cached value for key, loading it on a miss.
+
+        Concurrent misses for the same key share a single load, so a cold
+        cache does not turn a burst of requests into a burst of queries.
+        """
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        versions = self._snapshot(tags)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            # Misses (None) are not kept, so probing random ids cannot fill the cache
+            if value is not None:
+                self.set(key, value, versions)
+            return value
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    def add_listener(self, listener: Callable[[Optional[str], Optional[str]], None]) -> None:
+        """
+        Call listener(namespace, item_id) after every local invalidation.
+
+        clear() reports (None, None). Used to tell other workers about writes.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, namespace: Optional[str], item_id: Optional[str]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(namespace, item_id)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+
+    def invalidate(self, namespace: str, item_id: Optional[str] = None, broadcast: bool = True) -> None:
+        """
+        Invalidate cached reads for a collection.
+
+        Listings always depend on the namespace tag; single-item reads depend
+        only on their own item tag, so creating a document leaves cached items
+        untouched while updating or deleting one drops just that item.
+        broadcast=False skips the listeners, for invalidations that came from
+        another worker in the first place.
+        """
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        if item_id is not None:
+            item_tag = item_tag_for(namespace, item_id)
+            self._versions[item_tag] = self._versions.get(item_tag, 0) + 1
+        if broadcast:
+            self._notify(namespace, item_id)
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        """Invalidate listings and every single-item read of a collection, without notifying listeners"""
+        for tag in (namespace, items_tag_for(namespace)):
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self, broadcast: bool = True) -> None:
+        """Drop every entry and invalidate all in-flight loads"""
+        self._entries.clear()
+        # Every entry depends on the "*" generation tag
+        self._versions["*"] = self._versions.get("*", 0) + 1
+        if broadcast:
+            self._notify(None, None)
+
+
+def item_tag_for(namespace: str, item_id: str) -> str:
+    """Tag that single-item reads of a collection depend on"""
+    return f"{namespace}:{item_id}"
+
+
+def items_tag_for(namespace: str) -> str:
+    """Tag that every single-item read of a collection depends on"""
+    return f"{namespace}:*"
+
+
+def list_tags(namespace: str) -> Tuple[str, ...]:
+    """Tags that listing reads of a collection depend on"""
+    return ("*", namespace)
+
+
+def item_tags(namespace: str, item_id: str) -> Tuple[str, ...]:
+    """Tags that single-item reads of a collection depend on"""
+    return ("*", items_tag_for(namespace), item_tag_for(namespace, item_id))
+
+
+content_cache = VersionedCache(
+    ttl_seconds=settings.CONTENT_CACHE_TTL_SECONDS,
+    max_entries=settings.CONTENT_CACHE_MAX_ENTRIES,
+)
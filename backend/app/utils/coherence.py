@@ -0,0 +1,214 @@
+"""
+Keep the per-process content cache coherent across workers and replicas
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+from app.config import settings
+from app.database import get_database
+from app.utils.cache import VersionedCache, content_cache
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSIONS_COLLECTION = "cache_versions"
+COHERENCE_MODES = ("auto", "change_stream", "poll", "off")
+
+# Returned by deployments without change streams (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = (40573,)
+
+RETRY_SECONDS_MAX = 30.0
+
+
+class CacheCoherence:
+    """
+    Apply writes made by other workers to this worker's content cache.
+
+    Every local invalidation of a watched collection is published by
+    incrementing a version document in cache_versions. Other workers learn
+    about writes in one of two ways:
+
+    - change streams (replica sets, sharded clusters): each change to a
+      watched collection invalidates exactly the affected reads, with no
+      delay beyond replication; the stream resumes from its last token
+      after errors, and invalidates everything watched if it cannot.
+    - polling: the version documents are read every poll_interval seconds
+      and a changed version invalidates the whole collection.
+
+    "auto" starts with change streams and falls back to polling when the
+    deployment does not support them. Versions are always published, so
+    workers that ended up in different modes still see each other's writes.
+    A worker also receives its own writes back, which costs one extra miss.
+    """
+
+    def __init__(
+        self,
+        cache: VersionedCache,
+        collections: Tuple[str, ...],
+        mode: str,
+        poll_interval: float,
+    ):
+        if mode not in COHERENCE_MODES:
+            raise ValueError(f"Unknown cache coherence mode {mode!r}, expected one of {', '.join(COHERENCE_MODES)}")
+        self.cache = cache
+        self.collections = collections
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.active_mode: Optional[str] = None
+        self._versions: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        cache.add_listener(self._on_local_invalidation)
+
+    async def start(self):
+        """Start publishing local writes and following everyone else's"""
+        if self._tasks or self.mode == "off":
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._publish_loop(), name="cache-coherence-publish"))
+        self._tasks.append(asyncio.create_task(self._follow(), name="cache-coherence-follow"))
+
+    async def stop(self):
+        """Stop following; local writes not yet published are published first"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            await self.publish()
+        self.active_mode = None
+
+    def _on_local_invalidation(self, namespace: Optional[str], item_id: Optional[str]) -> None:
+        if self._wakeup is None:
+            return
+        if namespace is None:
+            self._dirty.update(self.collections)
+        elif namespace in self.collections:
+            self._dirty.add(namespace)
+        else:
+            return
+        self._wakeup.set()
+
+    async def publish(self) -> None:
+        """Increment the version of every collection invalidated locally since the last publish"""
+        collection = get_database()[CACHE_VERSIONS_COLLECTION]
+        while self._dirty:
+            namespace = self._dirty.pop()
+            try:
+                document = await collection.find_one_and_update(
+                    {"_id": namespace},
+                    {"$inc": {"version": 1}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except Exception:
+                self._dirty.add(namespace)
+                raise
+            # Our own bump: nothing for the poller of this worker to invalidate
+            if self._versions.get(namespace) == document["version"] - 1:
+                self._versions[namespace] = document["version"]
+
+    async def _publish_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning(f"Error publishing cache invalidations, retrying: {e}")
+                await asyncio.sleep(self.poll_interval)
+                self._wakeup.set()
+
+    async def _follow(self):
+        if self.mode in ("auto", "change_stream"):
+            try:
+                await self._watch()
+                return
+            except OperationFailure as e:
+                if self.mode != "auto" or e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.error(f"Cannot open change stream, other workers' writes are not followed: {e}")
+                    return
+                logger.info("Change streams are not supported by this deployment, polling cache versions")
+        await self._poll()
+
+    def apply_change(self, change: dict) -> None:
+        """Invalidate the reads affected by one change stream event"""
+        operation = change.get("operationType")
+        namespace = change.get("ns", {}).get("coll")
+        if operation == "insert":
+            self.cache.invalidate(namespace, broadcast=False)
+        elif operation in ("update", "replace", "delete"):
+            self.cache.invalidate(namespace, str(change["documentKey"]["_id"]), broadcast=False)
+        elif namespace in self.collections:
+            # drop, rename, ...: anything could have changed
+            self.cache.invalidate_namespace(namespace)
+        else:
+            # dropDatabase, invalidate
+            self._invalidate_all()
+
+    def _invalidate_all(self) -> None:
+        for namespace in self.collections:
+            self.cache.invalidate_namespace(namespace)
+
+    async def _watch(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.collections)}}}]
+        resume_token = None
+        delay = self.poll_interval
+        while True:
+            try:
+                async with get_database().watch(pipeline, resume_after=resume_token) as stream:
+                    if self.active_mode is None:
+                        logger.info(f"Following {', '.join(self.collections)} through change streams")
+                    elif resume_token is None:
+                        # Events between the old stream and this one are unknown
+                        self._invalidate_all()
+                    self.active_mode = "change_stream"
+                    delay = self.poll_interval
+                    async for change in stream:
+                        self.apply_change(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if self.active_mode is None:
+                    raise
+                # e.g. the resume point fell off the oplog: start over from now,
+                # the reopened stream invalidates everything watched
+                logger.warning(f"Change stream cannot resume, restarting it: {e}")
+                resume_token = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_SECONDS_MAX)
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_SECONDS_MAX)
+
+    async def poll(self) -> None:
+        """Read the version documents once and invalidate collections written elsewhere"""
+        cursor = get_database()[CACHE_VERSIONS_COLLECTION].find({"_id": {"$in": list(self.collections)}})
+        versions = {document["_id"]: document.get("version", 0) async for document in cursor}
+        for namespace in self.collections:
+            # A missing document is version 0: nobody has written yet
+            version = versions.get(namespace, 0)
+            known = self._versions.get(namespace)
+            self._versions[namespace] = version
+            if known is not None and known != version:
+                self.cache.invalidate_namespace(namespace)
+
+    async def _poll(self):
+        self.active_mode = "poll"
+        logger.info(f"Polling cache versions of {', '.join(self.collections)} every {self.poll_interval}s")
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Error polling cache versions: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+cache_coherence = CacheCoherence(
+    cache=content_cache,
+    collections=("projects", "clients"),
+    mode=settings.CACHE_COHERENCE_MODE,
+    poll_interval=settings.CACHE_COHERENCE_POLL_SECONDS,
+)
@@ -0,0 +1,152 @@
+"""
+Conditional HTTP responses (ETag / Last-Modified) for public content
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+from fastapi import Request, Response
+from app.config import settings
+from app.utils.serialization import dumps
+import gzip
+import hashlib
+
+CACHE_CONTROL = "public, no-cache"
+
+# Document fields last_modified_of() reads, kept in projections for that reason
+LAST_MODIFIED_FIELDS = ("updated_at", "created_at")
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    """Serialized response body together with its validators"""
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    gzip_body: Optional[bytes] = None
+
+
+def last_modified_of(documents: Iterable[dict]) -> Optional[datetime]:
+    """
+    Latest created_at/updated_at across raw Mongo documents.
+
+    Only meaningful for single documents: for a list, deleting an item
+    does not advance it, so list payloads carry an ETag alone.
+    """
+    latest = None
+    for document in documents:
+        for name in LAST_MODIFIED_FIELDS:
+            value = document.get(name)
+            if isinstance(value, datetime) and (latest is None or value > latest):
+                latest = value
+    return latest
+
+
+def build_payload(
+    content: Any,
+    last_modified: Optional[datetime] = None,
+    headers: Optional[Dict[str, str]] = None,
+    precompress: bool = False,
+) -> CachedPayload:
+    """
+    Serialize content once and derive an ETag from the bytes.
+
+    The ETag is weak: the same tag goes out with the identity body and with
+    its gzip encoding (precompressed here or by GZipMiddleware), which a
+    strong validator must not do.
+
+    Args:
+        content: Serializer rows, Pydantic model(s) or plain JSON-compatible data
+        last_modified: Optional modification time of the underlying documents
+        headers: Extra response headers that belong with this body
+        precompress: Also gzip the body now, so cache hits are not compressed per request
+
+    Returns:
+        CachedPayload: Body bytes, ETag, Last-Modified and extra headers
+    """
+    body = dumps(content)
+    etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    gzip_body = None
+    if precompress and len(body) >= settings.GZIP_MINIMUM_SIZE:
+        gzip_body = gzip.compress(body, compresslevel=settings.GZIP_COMPRESS_LEVEL)
+    return CachedPayload(
+        body=body, etag=etag, last_modified=last_modified, headers=headers or {}, gzip_body=gzip_body
+    )
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison is what RFC 9110 prescribes for If-None-Match
+    opaque_tag = etag.removeprefix("W/")
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == opaque_tag for candidate in candidates
+    )
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive datetimes that are already UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values ("gzip;q=0" refuses it)"""
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding] = quality
+    # An explicit gzip entry wins over the "*" wildcard
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def conditional_response(request: Request, payload: CachedPayload) -> Response:
+    """
+    Build a 200 or 304 response for a cached payload.
+
+    If-None-Match takes precedence over If-Modified-Since; a 304 reuses the
+    validators already stored with the payload, so nothing is serialized.
+    Precompressed payloads are sent as-is to clients accepting gzip
+    (GZipMiddleware leaves responses with a Content-Encoding alone).
+    """
+    headers = {**payload.headers, "ETag": payload.etag, "Cache-Control": CACHE_CONTROL}
+    if payload.gzip_body is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if payload.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(payload.last_modified), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, payload.etag)
+    elif if_modified_since is not None and payload.last_modified is not None:
+        not_modified = _not_modified_since(if_modified_since, payload.last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if payload.gzip_body is not None and accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
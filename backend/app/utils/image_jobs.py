@@ -0,0 +1,297 @@
+"""
+Background image-processing jobs backed by a Mongo collection
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from app.config import settings
+from app.database import get_collection, get_database
+from app.utils.cache import content_cache
+from app.utils.image_processor import (
+    read_upload,
+    resolve_app_path,
+    save_image_variants,
+    sniff_image,
+)
+import asyncio
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "image_jobs"
+
+
+def _staging_path(job_id: ObjectId) -> str:
+    return os.path.join(resolve_app_path(settings.IMAGE_JOB_STAGING_DIR), str(job_id))
+
+
+def _write_staged(path: str, image_bytes: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as staged_file:
+        staged_file.write(image_bytes)
+        staged_file.flush()
+        os.fsync(staged_file.fileno())
+    os.replace(temp_path, path)
+
+
+def _read_staged(path: str) -> bytes:
+    with open(path, "rb") as staged_file:
+        return staged_file.read()
+
+
+def _remove_staged(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _mark_image_failed(collection: str, document_id: ObjectId, job_id: ObjectId) -> None:
+    # Only while the document still waits for this job
+    await get_collection(collection).update_one(
+        {"_id": document_id, "image_job_id": job_id},
+        {"$set": {"image_status": "failed", "updated_at": datetime.utcnow()}},
+    )
+    content_cache.invalidate(collection, str(document_id))
+
+
+async def stage_upload(image_file) -> ObjectId:
+    """
+    Validate an upload and stage it on disk for a background job.
+
+    The upload is checked (size, format, dimensions) here, so a bad file
+    still fails the request instead of a job.
+
+    Args:
+        image_file: Uploaded file object
+
+    Returns:
+        ObjectId: Id of the job that will process it
+    """
+    image_bytes, _ = await read_upload(image_file)
+    sniff_image(image_bytes)
+
+    job_id = ObjectId()
+    await asyncio.to_thread(_write_staged, _staging_path(job_id), image_bytes)
+    return job_id
+
+
+async def queue_image_job(job_id: ObjectId, collection: str, document_id: ObjectId) -> None:
+    """
+    Queue a staged upload for processing.
+
+    The document must already carry image_job_id=job_id; the job only
+    fills in the image while that is still the case, so a later upload
+    always wins over a job that finishes late. If the job cannot be
+    queued, the document's image is marked failed instead of staying
+    "processing" forever.
+
+    Args:
+        job_id: Id returned by stage_upload
+        collection: Collection of the document to fill in ("projects" or "clients")
+        document_id: _id of that document
+    """
+    now = datetime.utcnow()
+    db = get_database()
+    try:
+        await db[JOBS_COLLECTION].insert_one({
+            "_id": job_id,
+            "collection": collection,
+            "document_id": document_id,
+            "status": "queued",
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+    except Exception:
+        await discard_staged_upload(job_id)
+        await _mark_image_failed(collection, document_id, job_id)
+        raise
+    image_job_queue.notify()
+
+
+async def discard_staged_upload(job_id: ObjectId) -> None:
+    """Remove a staged upload whose document or job could not be stored"""
+    await asyncio.to_thread(_remove_staged, _staging_path(job_id))
+
+
+def accepted_response(content: BaseModel, job_id: ObjectId) -> JSONResponse:
+    """202 response for a document whose image is still being processed"""
+    status_url = f"/api/admin/image-jobs/{job_id}"
+    return JSONResponse(
+        status_code=202,
+        content={**jsonable_encoder(content), "job_id": str(job_id), "status_url": status_url},
+        headers={"Location": status_url},
+    )
+
+
+async def get_job_status(job_id: ObjectId) -> Optional[dict]:
+    """Job document plus its position among queued jobs"""
+    db = get_database()
+    job = await db[JOBS_COLLECTION].find_one({"_id": job_id})
+    if not job:
+        return None
+
+    queue_position = None
+    if job["status"] == "queued":
+        queue_position = await db[JOBS_COLLECTION].count_documents({
+            "status": "queued",
+            "_id": {"$lt": job["_id"]},
+        })
+    return {
+        "id": str(job["_id"]),
+        "collection": job["collection"],
+        "document_id": str(job["document_id"]),
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "queue_position": queue_position,
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+class ImageJobQueue:
+    """
+    Pool of asyncio workers draining the image_jobs collection.
+
+    Jobs are claimed with an atomic find_one_and_update that takes a lease.
+    A job whose lease ran out (its worker or process died) is claimed again,
+    so queued work survives restarts and is shared safely between
+    processes. Workers wake up immediately for jobs queued in this process
+    and poll for jobs queued elsewhere.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, max_attempts: int, lease_seconds: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        """Start the worker tasks"""
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"image-job-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info(f"Image job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Cancel the workers; a job cut short is picked up again once its lease expires"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self):
+        """Wake idle workers after a job was queued"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        db = get_database()
+        return await db[JOBS_COLLECTION].find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming so a job queued meanwhile is not missed
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except Exception as e:
+                logger.error(f"Error running image job: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: dict):
+        db = get_database()
+        jobs = db[JOBS_COLLECTION]
+        collection = job["collection"]
+        document_id = job["document_id"]
+        staged_path = _staging_path(job["_id"])
+
+        try:
+            image_bytes = await asyncio.to_thread(_read_staged, staged_path)
+            processed_image = await save_image_variants(image_bytes, hashlib.sha256(image_bytes))
+        except Exception as e:
+            failed = job["attempts"] >= self.max_attempts
+            logger.error(f"Image job {job['_id']} failed (attempt {job['attempts']}): {e}")
+            await jobs.update_one(
+                {"_id": job["_id"]},
+                {"$set": {
+                    "status": "failed" if failed else "queued",
+                    "error": str(e),
+                    "updated_at": datetime.utcnow(),
+                }},
+            )
+            if failed:
+                await asyncio.to_thread(_remove_staged, staged_path)
+                await _mark_image_failed(collection, document_id, job["_id"])
+            return
+
+        # A newer upload (sync or async) replaced image_job_id: its image wins
+        result = await get_collection(collection).update_one(
+            {"_id": document_id, "image_job_id": job["_id"]},
+            {"$set": {
+                "image_url": processed_image.image_url,
+                "image_variants": processed_image.variants,
+                "image_status": "ready",
+                "updated_at": datetime.utcnow(),
+            }},
+        )
+        if result.matched_count:
+            content_cache.invalidate(collection, str(document_id))
+        else:
+            logger.info(f"Image job {job['_id']} superseded, {collection} {document_id} not updated")
+        await jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": "done" if result.matched_count else "superseded",
+                "error": None,
+                "updated_at": datetime.utcnow(),
+            }},
+        )
+        await asyncio.to_thread(_remove_staged, staged_path)
+
+
+image_job_queue = ImageJobQueue(
+    workers=settings.IMAGE_JOB_WORKERS,
+    poll_interval=settings.IMAGE_JOB_POLL_SECONDS,
+    max_attempts=settings.IMAGE_JOB_MAX_ATTEMPTS,
+    lease_seconds=settings.IMAGE_JOB_TIMEOUT_SECONDS * 2,
+)
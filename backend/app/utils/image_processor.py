@@ -1,84 +1,470 @@
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
+from fastapi import HTTPException
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
 import io
+import json
+import math
+import multiprocessing
 import os
+import time
+import uuid
+import warnings
 from app.config import settings
+from app.utils.metrics import image_variants_reused, record_image_timings, upload_bytes, uploads
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Registers the AVIF codec with Pillow when installed
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
 
-async def crop_and_save_image(image_file, filename: str) -> str:
+# Pillow's own decompression bomb guard, in this process and in every worker
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# URL path the uploads directory is served under
+UPLOAD_URL_PREFIX = "/static/uploads/"
+
+# Bump when the rendering changes so old content keys stop matching
+PIPELINE_VERSION = 1
+
+# format name -> (Pillow format, file extension, extra save options)
+IMAGE_FORMATS = {
+    "avif": ("AVIF", ".avif", {}),
+    "webp": ("WEBP", ".webp", {"method": 4}),
+    "jpeg": ("JPEG", ".jpg", {"optimize": True, "progressive": True}),
+}
+
+
+def available_formats(requested: List[str]) -> List[str]:
+    """Requested output formats this Pillow build can encode, always ending with JPEG"""
+    Image.init()
+    formats = [
+        image_format for image_format in requested
+        if image_format in IMAGE_FORMATS and IMAGE_FORMATS[image_format][0] in Image.SAVE
+    ]
+    if "jpeg" in formats:
+        formats.remove("jpeg")
+    return formats + ["jpeg"]
+
+
+@dataclass
+class ProcessedImage:
+    """URLs of a processed upload"""
+    image_url: str
+    variants: Dict[str, Dict[str, str]]
+
+
+class ImageEngine:
     """
-    Crop image to specified ratio (450x350) and save it.
-    
+    Runs CPU-bound image work off the event loop.
+
+    With IMAGE_WORKERS > 0 jobs go to a process pool so decoding and
+    resizing scale across cores; with 0 they fall back to the default
+    thread pool (useful for development and scripts).
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        """Create the worker pool"""
+        if self.workers > 0 and self._executor is None:
+            # Forking a process that already runs Motor's threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Image engine started with {self.workers} worker processes")
+
+    async def shutdown(self):
+        """Wait for running jobs, drop queued ones and stop the workers"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+            logger.info("Image engine stopped")
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """
+        Kill the worker processes of a pool, so a job that timed out stops
+        using the CPU, and start a fresh pool unless another failed job
+        already replaced this one.
+        """
+        if self._executor is executor:
+            self._executor = None
+            self.start()
+        # ProcessPoolExecutor cannot cancel a running call; terminating its processes is the only way
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args):
+        """
+        Run func(*args) in a worker and wait at most `timeout` seconds.
+
+        On timeout the process pool is recycled, so the stuck job cannot keep
+        a core busy or write files later; other jobs running in the pool at
+        that moment fail with it (uploads answer 500, queued jobs retry).
+        In thread mode (IMAGE_WORKERS=0) threads cannot be stopped, and a
+        timed-out job runs to completion in the background.
+
+        Raises:
+            asyncio.TimeoutError: If the job does not finish in time
+        """
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, func, *args),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            if executor is not None:
+                if self._executor is executor:
+                    logger.error(f"Image job exceeded {self.timeout}s, restarting the worker pool")
+                self._recycle(executor)
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool so
+            # later uploads are not all failing. Every job of the broken pool
+            # lands here, only the first one replaces it.
+            if self._executor is executor:
+                logger.error("Image worker pool broke, restarting it")
+            self._recycle(executor)
+            raise
+
+
+image_engine = ImageEngine(
+    workers=settings.IMAGE_WORKERS,
+    timeout=settings.IMAGE_JOB_TIMEOUT_SECONDS,
+)
+
+
+def _temp_path(path: str) -> str:
+    # Unique per call: with IMAGE_WORKERS=0 concurrent renders share a process
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+
+def _center_crop_box(size: Tuple[int, int], target_ratio: float) -> Tuple[int, int, int, int]:
+    """Largest box with the target aspect ratio, centered in an image of the given size"""
+    original_width, original_height = size
+
+    # Calculate crop dimensions maintaining aspect ratio
+    if original_width / original_height > target_ratio:
+        # Image is wider than target ratio
+        new_height = original_height
+        new_width = int(original_height * target_ratio)
+        left = (original_width - new_width) // 2
+        top = 0
+        right = left + new_width
+        bottom = original_height
+    else:
+        # Image is taller than target ratio
+        new_width = original_width
+        new_height = int(original_width / target_ratio)
+        left = 0
+        top = (original_height - new_height) // 2
+        right = original_width
+        bottom = top + new_height
+
+    return left, top, right, bottom
+
+
+def _variant_widths(cropped_width: int, base_width: int, widths: List[int]) -> List[int]:
+    """Requested widths that do not upscale the source, always including the base width"""
+    selected = {width for width in widths if width <= cropped_width}
+    selected.add(base_width)
+    return sorted(selected, reverse=True)
+
+
+def _encode(image: Image.Image, file_path: str, image_format: str, quality: int) -> None:
+    pil_format, _, options = IMAGE_FORMATS[image_format]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        # JPEG has no alpha channel, flatten transparency onto white
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A") if image.mode == "RGBA" else None)
+        image = background
+    # Write under a temporary name so a concurrent upload of the same
+    # content never sees a half-written file
+    temp_path = _temp_path(file_path)
+    image.save(temp_path, pil_format, quality=quality, **options)
+    os.replace(temp_path, file_path)
+
+
+def _draft_for_output(image: Image.Image, width: int, height: int, largest_width: int) -> None:
+    """
+    Ask the JPEG decoder for a 1/2, 1/4 or 1/8 scale decode when the source
+    is much larger than the largest variant. The DCT scaling happens inside
+    libjpeg, so a 24MP photo never gets fully decoded just to produce 900px.
+    """
+    left, top, right, bottom = _center_crop_box(image.size, width / height)
+    largest_height = largest_width * height / width
+    scale = max(largest_width / (right - left), largest_height / (bottom - top))
+    if scale < 0.5:
+        # +1 keeps the cropped region from rounding below the largest width
+        image.draft(None, (math.ceil(image.width * scale) + 1, math.ceil(image.height * scale) + 1))
+
+
+def _render_variants(
+    image_bytes: bytes,
+    output_stem: str,
+    width: int,
+    height: int,
+    widths: List[int],
+    formats: List[str],
+    quality: int,
+) -> Tuple[Dict[str, Dict[str, str]], Dict[str, float]]:
+    """
+    Decode, center-crop to the target ratio and write every width/format variant.
+
+    Runs in an image engine worker. Each width is resized from the next
+    larger one, so only the first resize touches the full-size source.
+
+    Returns:
+        Tuple[Dict[str, Dict[str, str]], Dict[str, float]]: {format: {width: file name}}
+        and the seconds spent per stage (decode, resize, encode), for metrics
+    """
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        image = Image.open(io.BytesIO(image_bytes))
+
+    if image.format == "JPEG":
+        _draft_for_output(image, width, height, max(widths + [width]))
+
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    timings = {"decode": time.perf_counter() - started, "resize": 0.0, "encode": 0.0}
+
+    started = time.perf_counter()
+    cropped_image = image.crop(_center_crop_box(image.size, width / height))
+    timings["resize"] += time.perf_counter() - started
+
+    variants: Dict[str, Dict[str, str]] = {image_format: {} for image_format in formats}
+    source = cropped_image
+    for variant_width in _variant_widths(cropped_image.width, width, widths):
+        variant_height = round(variant_width * height / width)
+        started = time.perf_counter()
+        # reducing_gap lets Pillow box-reduce very large sources before LANCZOS
+        source = source.resize((variant_width, variant_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        timings["resize"] += time.perf_counter() - started
+        for image_format in formats:
+            extension = IMAGE_FORMATS[image_format][1]
+            file_path = f"{output_stem}-{variant_width}{extension}"
+            started = time.perf_counter()
+            _encode(source, file_path, image_format, quality)
+            timings["encode"] += time.perf_counter() - started
+            variants[image_format][str(variant_width)] = os.path.basename(file_path)
+
+    # The manifest is written last: its presence marks a complete set of variants
+    _write_manifest(f"{output_stem}.json", variants)
+    return variants, timings
+
+
+def _write_manifest(manifest_path: str, variants: Dict[str, Dict[str, str]]) -> None:
+    temp_path = _temp_path(manifest_path)
+    with open(temp_path, "w") as manifest_file:
+        json.dump(variants, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+
+def _read_manifest(manifest_path: str) -> Optional[Dict[str, Dict[str, str]]]:
+    try:
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _touch_variants(output_stem: str, variant_files: Dict[str, Dict[str, str]]) -> None:
+    """Refresh mtimes of reused variants so the upload sweeper treats them as new"""
+    output_dir = os.path.dirname(output_stem)
+    paths = [f"{output_stem}.json"] + [
+        os.path.join(output_dir, name) for files in variant_files.values() for name in files.values()
+    ]
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def content_key(upload_digest, params: tuple) -> str:
+    """Hash of the upload bytes and every parameter that affects the output"""
+    digest = upload_digest.copy()
+    digest.update(repr((PIPELINE_VERSION,) + params).encode())
+    return digest.hexdigest()
+
+
+async def read_upload(image_file) -> Tuple[bytearray, "hashlib._Hash"]:
+    """
+    Read an upload in chunks, enforcing MAX_UPLOAD_SIZE as bytes arrive.
+
+    The buffer is returned as is (BytesIO, Pillow and file writes take a
+    bytearray), so a large upload is not held in memory twice.
+
+    Returns:
+        Tuple[bytearray, hashlib._Hash]: The bytes and their running SHA-256
+
+    Raises:
+        HTTPException: 413 if the file is larger than MAX_UPLOAD_SIZE
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Image too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB",
+    )
+    # Starlette knows the spooled size up front, reject without reading it
+    if image_file.size is not None and image_file.size > settings.MAX_UPLOAD_SIZE:
+        raise too_large
+
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    while chunk := await image_file.read(UPLOAD_CHUNK_SIZE):
+        if len(buffer) + len(chunk) > settings.MAX_UPLOAD_SIZE:
+            raise too_large
+        buffer += chunk
+        digest.update(chunk)
+    uploads.inc()
+    upload_bytes.inc(len(buffer))
+    return buffer, digest
+
+
+def sniff_image(image_bytes: bytes) -> Tuple[str, Tuple[int, int]]:
+    """
+    Identify format and dimensions from the image header without decoding pixels.
+
+    Raises:
+        HTTPException: 400 for unknown or disallowed formats and decompression bombs
+    """
+    allowed_formats = {
+        Image.registered_extensions().get(f".{extension}") for extension in settings.ALLOWED_EXTENSIONS
+    }
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                image_format, size = image.format, image.size
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Invalid image: unrecognized or corrupt file")
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Image dimensions are too large")
+
+    if image_format not in allowed_formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+        )
+    if size[0] * size[1] > settings.IMAGE_MAX_PIXELS:
+        raise HTTPException(status_code=400, detail="Image dimensions are too large")
+    return image_format, size
+
+
+def shard_path(key: str) -> str:
+    """Relative directory for a content key, fanned out by its first two byte pairs"""
+    return f"{key[:2]}/{key[2:4]}"
+
+
+def resolve_app_path(path: str) -> str:
+    """Resolve a configured directory, relative paths being relative to the app directory"""
+    if not os.path.isabs(path):
+        import pathlib
+        app_dir = pathlib.Path(__file__).parent.parent
+        path = str(app_dir / path)
+    return path
+
+
+def _upload_dir() -> str:
+    return resolve_app_path(settings.UPLOAD_DIR)
+
+
+async def crop_and_save_image(image_file, filename: str) -> ProcessedImage:
+    """
+    Crop image to specified ratio (450x350) and save it in every configured
+    width and format.
+
     Args:
         image_file: Uploaded file object
         filename: Original filename
-        
+
     Returns:
-        str: Relative URL path to saved image
+        ProcessedImage: JPEG URL at the base size plus the {format: {width: url}} variant map
+    """
+    # Read image file in bounded chunks and check its header before any decoding
+    image_bytes, upload_digest = await read_upload(image_file)
+    sniff_image(image_bytes)
+    return await save_image_variants(image_bytes, upload_digest)
+
+
+async def save_image_variants(image_bytes: bytes, upload_digest) -> ProcessedImage:
+    """
+    Render and store every variant of an already validated image.
+
+    Output is content-addressed: files are named after a hash of the upload
+    bytes and the processing parameters and fanned out into two levels of
+    prefix directories. Re-uploading an identical image reuses the stored
+    variants without running the resize pipeline at all.
+
+    The decode/resize/encode work runs on the image engine, so the event
+    loop keeps serving other requests while a large upload is processed.
+
+    Args:
+        image_bytes: Raw upload bytes
+        upload_digest: Running SHA-256 of image_bytes
+
+    Returns:
+        ProcessedImage: JPEG URL at the base size plus the {format: {width: url}} variant map
     """
     try:
-        # Read image file
-        image_bytes = await image_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Get original dimensions
-        original_width, original_height = image.size
-        
-        # Calculate target aspect ratio
-        target_ratio = settings.IMAGE_CROP_WIDTH / settings.IMAGE_CROP_HEIGHT
-        
-        # Calculate crop dimensions maintaining aspect ratio
-        if original_width / original_height > target_ratio:
-            # Image is wider than target ratio
-            new_height = original_height
-            new_width = int(original_height * target_ratio)
-            left = (original_width - new_width) // 2
-            top = 0
-            right = left + new_width
-            bottom = original_height
+        widths = settings.image_variant_widths
+        formats = available_formats(settings.image_variant_formats)
+        params = (
+            settings.IMAGE_CROP_WIDTH,
+            settings.IMAGE_CROP_HEIGHT,
+            widths,
+            formats,
+            settings.IMAGE_QUALITY,
+        )
+        key = content_key(upload_digest, params)
+        relative_dir = shard_path(key)
+        output_dir = os.path.join(_upload_dir(), *relative_dir.split("/"))
+        output_stem = os.path.join(output_dir, key)
+
+        variant_files = _read_manifest(f"{output_stem}.json")
+        if variant_files is None:
+            os.makedirs(output_dir, exist_ok=True)
+            variant_files, timings = await image_engine.run(_render_variants, image_bytes, output_stem, *params)
+            record_image_timings(timings)
         else:
-            # Image is taller than target ratio
-            new_width = original_width
-            new_height = int(original_width / target_ratio)
-            left = 0
-            top = (original_height - new_height) // 2
-            right = original_width
-            bottom = top + new_height
-        
-        # Crop image
-        cropped_image = image.crop((left, top, right, bottom))
-        
-        # Resize to target dimensions
-        resized_image = cropped_image.resize(
-            (settings.IMAGE_CROP_WIDTH, settings.IMAGE_CROP_HEIGHT),
-            Image.Resampling.LANCZOS
+            logger.info(f"Reusing stored variants for image {key}")
+            _touch_variants(output_stem, variant_files)
+            image_variants_reused.inc()
+
+        # Return relative URL paths
+        variants = {
+            image_format: {
+                width: f"{UPLOAD_URL_PREFIX}{relative_dir}/{name}" for width, name in files.items()
+            }
+            for image_format, files in variant_files.items()
+        }
+        return ProcessedImage(
+            image_url=variants["jpeg"][str(settings.IMAGE_CROP_WIDTH)],
+            variants=variants,
         )
-        
-        # Generate unique filename
-        import uuid
-        file_extension = os.path.splitext(filename)[1] or ".jpg"
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Ensure upload directory exists
-        upload_dir = settings.UPLOAD_DIR
-        if not os.path.isabs(upload_dir):
-            # If relative path, make it relative to app directory
-            import pathlib
-            app_dir = pathlib.Path(__file__).parent.parent
-            upload_dir = str(app_dir / upload_dir)
-        
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save image
-        file_path = os.path.join(upload_dir, unique_filename)
-        resized_image.save(file_path, quality=85, optimize=True)
-        
-        # Return relative URL path
-        return f"/static/uploads/{unique_filename}"
-        
+
+    except asyncio.TimeoutError:
+        logger.error(f"Image processing timed out after {image_engine.timeout}s")
+        raise Exception("Failed to process image: processing timed out")
     except Exception as e:
         logger.error(f"Error processing image: {e}")
         raise Exception(f"Failed to process image: {str(e)}")
-
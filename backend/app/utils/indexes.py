@@ -0,0 +1,146 @@
+"""
+Index declarations for every collection, plus a query-plan check against them
+"""
+from typing import Any, Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# collection -> indexes the routers rely on (_id is always indexed)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "contacts": [
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+    ],
+    "newsletters": [
+        IndexModel([("subscribed_at", DESCENDING)], name="subscribed_at_desc"),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "rate_limits": [
+        # Buckets disappear once they would be full again
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "revoked_tokens": [
+        # Revocations are only needed until the token expires on its own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "image_jobs": [
+        # Claiming and queue position filter on status and order by _id
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+    ],
+}
+
+
+def _router_queries() -> List[Dict[str, Any]]:
+    """The find() shapes issued by the routers, with placeholder values"""
+    some_id = ObjectId()
+    return [
+        {"name": "projects.list", "collection": "projects", "filter": {}, "sort": [("_id", ASCENDING)], "limit": 101},
+        {"name": "projects.get", "collection": "projects", "filter": {"_id": some_id}, "limit": 1},
+        {"name": "clients.list", "collection": "clients", "filter": {}, "sort": [("_id", ASCENDING)], "limit": 101},
+        {"name": "clients.get", "collection": "clients", "filter": {"_id": some_id}, "limit": 1},
+        {"name": "contacts.list", "collection": "contacts", "filter": {}, "sort": [("created_at", DESCENDING)], "limit": 1000},
+        {"name": "contacts.export", "collection": "contacts", "filter": {}, "sort": [("_id", DESCENDING)]},
+        {"name": "newsletters.list", "collection": "newsletters", "filter": {}, "sort": [("subscribed_at", DESCENDING)], "limit": 1000},
+        {"name": "newsletters.export", "collection": "newsletters", "filter": {}, "sort": [("_id", DESCENDING)]},
+        {"name": "newsletters.subscribe", "collection": "newsletters", "filter": {"email": "probe@example.com"}, "limit": 1},
+        {
+            "name": "image_jobs.claim",
+            "collection": "image_jobs",
+            "filter": {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": some_id.generation_time}},
+            ]},
+            "sort": [("_id", ASCENDING)],
+            "limit": 1,
+        },
+        {"name": "image_jobs.queue_position", "collection": "image_jobs", "filter": {"status": "queued", "_id": {"$lt": some_id}}},
+    ]
+
+
+async def ensure_indexes(db) -> None:
+    """
+    Create every declared index.
+
+    createIndexes is a no-op for indexes that already exist with the same
+    spec, so this runs on every startup. A collection whose index cannot be
+    built (e.g. duplicate emails blocking the unique index) is logged and
+    skipped rather than keeping the app from starting.
+
+    Args:
+        db: Motor database
+    """
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+
+
+def _plan_stages(plan) -> List[str]:
+    """All stage names in a (possibly nested or sharded) winning plan"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def explain_queries(db) -> Dict[str, Any]:
+    """
+    Run explain() on every router query and flag collection scans.
+
+    Args:
+        db: Motor database
+
+    Returns:
+        dict: Per-query winning-plan stages and the names of queries doing a COLLSCAN
+    """
+    results = []
+    for query in _router_queries():
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        if query.get("limit"):
+            cursor = cursor.limit(query["limit"])
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        results.append({
+            "name": query["name"],
+            "collection": query["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+
+    collscans = [result["name"] for result in results if result["collscan"]]
+    for name in collscans:
+        logger.warning(f"Query {name} is a collection scan")
+    return {"queries": results, "collscans": collscans}
+
+
+if __name__ == "__main__":
+    # CI check: python -m app.utils.indexes (exits 1 on any COLLSCAN)
+    import asyncio
+    import sys
+    from app.database import connect_to_mongo, close_mongo_connection, get_database
+
+    async def _check() -> int:
+        await connect_to_mongo()
+        try:
+            db = get_database()
+            await ensure_indexes(db)
+            report = await explain_queries(db)
+        finally:
+            await close_mongo_connection()
+        for result in report["queries"]:
+            print(f"{'COLLSCAN' if result['collscan'] else 'ok':8} {result['name']}: {' > '.join(result['stages'])}")
+        return 1 if report["collscans"] else 0
+
+    sys.exit(asyncio.run(_check()))
@@ -0,0 +1,79 @@
+"""
+In-process membership cache answering repeat newsletter subscribes
+"""
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipCache:
+    """
+    Size-bounded LRU map of email -> subscription document.
+
+    Subscriptions are never removed through the API, so a hit is always
+    correct and can be answered without a round trip. A miss only means
+    "not known here" and falls through to the atomic upsert, so each
+    worker can keep its own cache without coordinating with the others.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._members: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[dict]:
+        """Cached subscription document for email, or None"""
+        document = self._members.get(email)
+        if document is None:
+            self.misses += 1
+            return None
+        self._members.move_to_end(email)
+        self.hits += 1
+        return document
+
+    def add(self, document: dict) -> None:
+        """Remember a stored subscription document"""
+        if self.max_entries <= 0:
+            return
+        self._members[document["email"]] = document
+        self._members.move_to_end(document["email"])
+        while len(self._members) > self.max_entries:
+            self._members.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget every member"""
+        self._members.clear()
+
+    async def warm(self, collection) -> int:
+        """
+        Load the most recent subscriptions, up to the cache size.
+
+        Args:
+            collection: Motor newsletters collection
+
+        Returns:
+            int: Number of members loaded
+        """
+        if self.max_entries <= 0:
+            return 0
+        try:
+            cursor = collection.find(
+                {}, {"email": 1, "subscribed_at": 1}
+            ).sort("subscribed_at", -1).limit(self.max_entries)
+            documents = await cursor.to_list(length=self.max_entries)
+        except Exception as e:
+            logger.error(f"Error warming newsletter membership cache: {e}")
+            return 0
+
+        # Oldest first, so the most recent end up as most recently used
+        for document in reversed(documents):
+            self.add(document)
+        logger.info(f"Newsletter membership cache warmed with {len(documents)} members")
+        return len(documents)
+
+
+newsletter_members = MembershipCache(max_entries=settings.NEWSLETTER_MEMBERSHIP_CACHE_SIZE)
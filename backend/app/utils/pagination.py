@@ -0,0 +1,67 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+def parse_cursor(after: Optional[str]) -> Optional[ObjectId]:
+    """Validate an ?after= cursor and turn it into the _id it points at"""
+    if after is None:
+        return None
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ObjectId(after)
+
+
+async def fetch_page(
+    collection,
+    limit: int,
+    after: Optional[ObjectId] = None,
+    query: Optional[dict] = None,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page ordered by _id using a range query on the _id index.
+
+    One extra document is requested to know whether another page exists, so
+    the cost of a page does not depend on how deep into the collection it is.
+
+    Args:
+        collection: Motor collection to read from
+        limit: Page size
+        after: Last _id of the previous page
+        query: Additional filter criteria
+        projection: Fields to return (_id is always returned)
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: Documents and the cursor for the next page
+    """
+    criteria = dict(query or {})
+    if after is not None:
+        criteria["_id"] = {"$gt": after}
+
+    documents = await collection.find(criteria, projection).sort("_id", 1).limit(limit + 1).to_list(length=limit + 1)
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, str(documents[-1]["_id"])
+    return documents, None
+
+
+def pagination_headers(
+    path: str,
+    limit: int,
+    next_cursor: Optional[str],
+    params: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """Headers advertising the next page, if there is one; params are carried over to its URL"""
+    if next_cursor is None:
+        return {}
+    query = {key: value for key, value in (params or {}).items() if value is not None}
+    next_url = f"{path}?{urlencode({**query, 'limit': limit, 'after': next_cursor})}"
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{next_url}>; rel="next"',
+    }
@@ -0,0 +1,235 @@
+"""
+Opt-in profiling of single requests for admins
+"""
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from fastapi import HTTPException, Request
+from starlette.datastructures import MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.auth.dependencies import get_current_admin
+from app.config import settings
+from app.utils.image_processor import resolve_app_path
+from app.utils.rate_limit import Bucket, MemoryBucketStore
+import asyncio
+import cProfile
+import glob
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "__profile"
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_EXTENSIONS = {"sample": ".folded", "cprofile": ".prof"}
+IDLE_STACK = "(event loop waiting for I/O)"
+
+# Names generated by _profile_name(), the only files the retrieval endpoint serves
+PROFILE_ID_PATTERN = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}\.(folded|prof)$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread, producing folded stacks.
+
+    A background thread snapshots the target thread's stack every interval
+    seconds, so the profiled code runs at full speed; the cost is one stack
+    walk per sample and stops after max_seconds however long the request
+    takes. The output ("outer;inner;leaf count" per line) feeds
+    flamegraph.pl, speedscope or inferno directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_seconds: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None and frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+                # The loop is idle: the request is waiting on Mongo, disk or the image workers
+                self.samples[IDLE_STACK] += 1
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _profile_name(mode: str) -> str:
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}{PROFILE_EXTENSIONS[mode]}"
+
+
+def profile_dir() -> str:
+    return resolve_app_path(settings.PROFILE_DIR)
+
+
+def list_profiles() -> List[dict]:
+    """Stored profiles, newest first"""
+    profiles = []
+    for path in glob.glob(os.path.join(profile_dir(), "*")):
+        name = os.path.basename(path)
+        if PROFILE_ID_PATTERN.match(name):
+            stat = os.stat(path)
+            profiles.append({
+                "id": name,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime),
+            })
+    return sorted(profiles, key=lambda profile: profile["id"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored profile, or None for unknown or malformed ids"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(profile_dir(), profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def _store_profile(name: str, profiler) -> None:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    if isinstance(profiler, StackSampler):
+        with open(path, "w", encoding="utf-8") as profile_file:
+            profile_file.write(profiler.folded())
+    else:
+        profiler.dump_stats(path)
+    # Keep only the most recent profiles
+    for stale in list_profiles()[settings.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(directory, stale["id"]))
+        except OSError:
+            pass
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when an admin asks for it.
+
+    A request is profiled when it carries "X-Profile: sample|cprofile" or
+    "?__profile=sample|cprofile" and a valid admin bearer token; for anyone
+    else the flag is ignored. "sample" takes stack samples of the event
+    loop thread every PROFILE_SAMPLE_INTERVAL_MS and stores folded stacks
+    for flame graphs; "cprofile" records every call (more overhead) as a
+    pstats file for snakeviz or gprof2dot. The loop serves other requests
+    meanwhile, so their work shows up in the profile too.
+
+    At most one request is profiled at a time and PROFILE_MAX_PER_MINUTE
+    per process; other flagged requests run normally. The response carries
+    X-Profile-Id, retrievable from /api/admin/diagnostics/profiles/{id}.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._active = False
+        self._budget = MemoryBucketStore(max_keys=1)
+        self._bucket = Bucket(
+            capacity=settings.PROFILE_MAX_PER_MINUTE, rate=settings.PROFILE_MAX_PER_MINUTE / 60
+        )
+
+    def _requested_mode(self, scope: Scope) -> Optional[str]:
+        mode = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                mode = value.decode("latin-1").strip().lower()
+                break
+        if mode is None:
+            mode = QueryParams(scope.get("query_string", b"")).get(PROFILE_QUERY_PARAM)
+        if mode in ("1", "true"):
+            return PROFILE_MODES[0]
+        return mode if mode in PROFILE_MODES else None
+
+    async def _allowed(self, scope: Scope) -> Optional[str]:
+        """None if the request may be profiled, else the reason it is not"""
+        try:
+            await get_current_admin(Request(scope))
+        except HTTPException:
+            return "unauthorized"
+        if self._active:
+            return "busy"
+        allowed, _ = await self._budget.take("profile", self._bucket)
+        return None if allowed else "rate-limited"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        refused = await self._allowed(scope)
+        if refused == "unauthorized":
+            await self.app(scope, receive, send)
+            return
+        if refused is not None:
+            await self.app(scope, receive, self._with_headers(send, {"X-Profile-Status": refused}))
+            return
+
+        name = _profile_name(mode)
+        if mode == "sample":
+            profiler = StackSampler(
+                threading.get_ident(),
+                interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+                max_seconds=settings.PROFILE_MAX_SECONDS,
+            )
+        else:
+            profiler = cProfile.Profile()
+
+        self._active = True
+        if mode == "sample":
+            profiler.start()
+        else:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, self._with_headers(send, {"X-Profile-Id": name}))
+        finally:
+            if mode == "sample":
+                await asyncio.to_thread(profiler.stop)
+            else:
+                profiler.disable()
+            self._active = False
+            try:
+                await asyncio.to_thread(_store_profile, name, profiler)
+                logger.info(f"Stored {mode} profile {name} of {scope['method']} {scope['path']}")
+            except Exception as e:
+                logger.error(f"Error storing profile {name}: {e}")
+
+    @staticmethod
+    def _with_headers(send: Send, headers: dict) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+        return send_wrapper
@@ -0,0 +1,251 @@
+"""
+Token-bucket rate limiting for abuse-prone routes
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Union
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+from app.database import get_database
+import ipaddress
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+RATE_LIMITS_COLLECTION = "rate_limits"
+
+
+@dataclass
+class Bucket:
+    """Bucket holding up to capacity tokens, refilled at rate tokens per second"""
+    capacity: float
+    rate: float
+
+
+@dataclass
+class RateLimitRule:
+    """Per-client and global buckets for requests matching method and path prefix"""
+    method: str
+    path: str
+    per_ip: Bucket
+    global_: Bucket
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def matches(self, method: str, path: str) -> bool:
+        return self.method in ("*", method) and (
+            path == self.path or path.startswith(self.path.rstrip("/") + "/")
+        )
+
+
+def parse_rules(spec: str) -> List[RateLimitRule]:
+    """
+    Parse RATE_LIMIT_RULES.
+
+    Rules are separated by ";", each "METHOD /path=PER_IP/GLOBAL" with both
+    limits in requests per minute (also the burst size), e.g.
+    "POST /api/contact=10/600;* /api/seed=2/10".
+    """
+    rules = []
+    for item in spec.split(";"):
+        if not item.strip():
+            continue
+        route, limits = item.rsplit("=", 1)
+        method, path = route.split()
+        per_ip, global_ = (float(limit) for limit in limits.split("/"))
+        rules.append(RateLimitRule(
+            method=method.upper(),
+            path=path,
+            per_ip=Bucket(capacity=per_ip, rate=per_ip / 60),
+            global_=Bucket(capacity=global_, rate=global_ / 60),
+        ))
+    return rules
+
+
+def parse_proxies(proxies: List[str]) -> List[IPNetwork]:
+    """Parse trusted proxy IPs/CIDRs (RATE_LIMIT_TRUSTED_PROXIES)"""
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def _is_trusted(address: Optional[str], trusted_proxies: List[IPNetwork]) -> bool:
+    if not address or not trusted_proxies:
+        return False
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_ip(scope: Scope, trusted_proxies: List[IPNetwork]) -> str:
+    """
+    Client address, as seen by nginx when behind it.
+
+    Proxy headers are only used when the request comes straight from one
+    of trusted_proxies; anyone else could send any value in them. Our nginx
+    overwrites X-Real-IP with its peer address and appends the peer to
+    X-Forwarded-For, so from nginx, X-Real-IP, then the last
+    X-Forwarded-For hop, are the client's real address.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else None
+    if _is_trusted(peer, trusted_proxies):
+        headers = Headers(scope=scope)
+        real_ip = headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+        forwarded_for = headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[-1].strip()
+    return peer or "unknown"
+
+
+class MemoryBucketStore:
+    """Buckets of this process, least recently used evicted beyond max_keys"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, bucket: Bucket) -> Tuple[bool, float]:
+        """
+        Take one token from a bucket.
+
+        Returns:
+            Tuple[bool, float]: (allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (bucket.capacity, now))
+        tokens = min(bucket.capacity, tokens + (now - updated) * bucket.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / bucket.rate
+
+
+class MongoBucketStore:
+    """
+    Buckets shared by every worker, one document per bucket.
+
+    Refill and take happen in a single update pipeline, so concurrent
+    workers cannot both spend the last token. Timestamps are epoch seconds
+    taken from this process; documents expire through a TTL index once the
+    bucket would be full again.
+    """
+
+    async def take(self, key: str, bucket: Bucket) -> Tuple[bool, float]:
+        """
+        Take one token from a bucket.
+
+        Returns:
+            Tuple[bool, float]: (allowed, seconds until a token is available)
+        """
+        now = time.time()
+        refilled = {"$min": [
+            bucket.capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", bucket.capacity]},
+                {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, bucket.rate]},
+            ]},
+        ]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now}},
+            {"$set": {
+                "allowed": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": datetime.utcnow() + timedelta(seconds=bucket.capacity / bucket.rate),
+            }},
+        ]
+        collection = get_database()[RATE_LIMITS_COLLECTION]
+        for attempt in range(2):
+            try:
+                document = await collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two workers created the bucket at once, the retry updates it
+                if attempt:
+                    raise
+        allowed = document["allowed"]
+        return allowed, 0.0 if allowed else (1 - document["tokens"]) / bucket.rate
+
+
+class RateLimitMiddleware:
+    """
+    Answer 429 with Retry-After once a client, or everyone together,
+    exhausts the buckets of a matching rule.
+
+    The per-IP bucket stops a single abuser; the global bucket sheds load
+    when many clients burst at once. Requests matching no rule pass
+    through untouched. If the shared store is unreachable requests are
+    let through, so an outage of the limiter never becomes an outage of
+    the site.
+    """
+
+    def __init__(self, app: ASGIApp, rules: List[RateLimitRule], store, trusted_proxies: List[str] = ()):
+        self.app = app
+        self.rules = rules
+        self.store = store
+        self.trusted_proxies = parse_proxies(list(trusted_proxies))
+
+    def _rule_for(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._rule_for(scope["method"], scope["path"])
+        if rule is not None:
+            retry_after = await self._check(rule, client_ip(scope, self.trusted_proxies))
+            if retry_after is not None:
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, please slow down"},
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+    async def _check(self, rule: RateLimitRule, ip: str) -> Optional[float]:
+        """Seconds to wait if the request is over the limit, else None"""
+        try:
+            allowed, retry_after = await self.store.take(f"{rule.name}|ip|{ip}", rule.per_ip)
+            if allowed:
+                allowed, retry_after = await self.store.take(f"{rule.name}|global", rule.global_)
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return None
+        if allowed:
+            return None
+        logger.debug(f"Rate limited {rule.name} for {ip}")
+        return retry_after
+
+
+def build_store():
+    """Bucket store selected by RATE_LIMIT_STORE ("memory" or "mongo")"""
+    if settings.RATE_LIMIT_STORE == "mongo":
+        return MongoBucketStore()
+    return MemoryBucketStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
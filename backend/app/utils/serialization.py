@@ -0,0 +1,114 @@
+"""
+Fast serialization of trusted Mongo documents straight to JSON bytes
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+import pydantic_core
+
+try:
+    # Fastest encoder, installed from requirements.txt; pydantic_core's encoder covers environments without it
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _fallback(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode JSON-compatible data plus ObjectId and datetime to bytes.
+
+    Pydantic models are accepted too (through pydantic_core), so existing
+    callers passing models keep working.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_fallback)
+        except TypeError:
+            # e.g. Pydantic models, which orjson does not know about
+            pass
+    return pydantic_core.to_json(content, fallback=_fallback)
+
+
+class DocumentSerializer:
+    """
+    Turns raw Mongo documents into the response shape of a model without validating them.
+
+    Documents in the database were validated on the way in, so list reads
+    skip building a model per document, the per-field validators and
+    FastAPI's second validation pass against response_model. Output
+    matches the model's JSON: its fields in declaration order, id as the
+    string form of _id, defaults filled in for fields a document lacks.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._fields: List[Tuple[str, Callable[[], Any]]] = []
+        for name, field in model.model_fields.items():
+            if name == "id":
+                continue
+            if field.default_factory is not None:
+                default = field.default_factory
+            else:
+                value = None if field.default is PydanticUndefined else field.default
+                default = lambda value=value: value
+            self._fields.append((name, default))
+
+    def select(self, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        Validate a ?fields= parameter against the model.
+
+        Args:
+            fields: Comma-separated field names, or None for all fields
+
+        Returns:
+            Optional[Tuple[str, ...]]: Requested fields in model order ("id" is
+            always included), or None for all fields
+
+        Raises:
+            HTTPException: 400 for names the model does not have
+        """
+        if fields is None:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(self.model.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(self.model.model_fields)}",
+            )
+        return ("id",) + tuple(name for name, _ in self._fields if name in requested)
+
+    @staticmethod
+    def projection(selected: Optional[Tuple[str, ...]], *always: str) -> Optional[Dict[str, int]]:
+        """Mongo projection for the selected fields plus any fields the handler itself needs"""
+        if selected is None:
+            return None
+        # An empty projection would return whole documents, so ask for _id explicitly
+        return {name: 1 for name in selected + always if name != "id"} or {"_id": 1}
+
+    def row(self, document: dict, selected: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Response dict for one document, limited to the selected fields"""
+        row = {"id": str(document["_id"]) if "_id" in document else None}
+        for name, default in self._fields:
+            if selected is not None and name not in selected:
+                continue
+            value = document.get(name, PydanticUndefined)
+            row[name] = default() if value is PydanticUndefined else value
+        return row
+
+    def rows(self, documents: Iterable[dict], selected: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """Response dicts for many documents"""
+        return [self.row(document, selected) for document in documents]
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Response with an already serializable body, bypassing response_model validation"""
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
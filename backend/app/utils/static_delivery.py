@@ -0,0 +1,155 @@
+"""
+Delivery of uploaded images: long-lived caching, Range requests and X-Accel-Redirect
+"""
+from typing import Optional, Sequence, Tuple
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+import anyio
+import os
+import re
+
+# Upload file names are unique per content (hash or uuid) and never rewritten
+IMMUTABLE_CACHE_CONTROL = "public, max-age={max_age}, immutable"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end).
+
+    Returns None for headers we do not handle (multiple ranges, other
+    units), in which case the whole file is served as RFC 9110 allows.
+
+    Raises:
+        HTTPException: 416 if the range lies outside the file
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+        return max(file_size - length, 0), file_size - 1
+
+    start = int(first)
+    end = min(int(last), file_size - 1) if last else file_size - 1
+    if start >= file_size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+    return start, end
+
+
+class PartialFileResponse(Response):
+    """206 response streaming one byte range of a file"""
+
+    def __init__(self, path: str, start: int, end: int, file_size: int, headers: dict, method: str):
+        super().__init__(status_code=206, headers=headers)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = method != "HEAD"
+        self.headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        self.headers["Content-Length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us, close the body anyway
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadSkippingGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that passes the given path prefixes through untouched.
+
+    Uploaded images are already compressed, and gzipping a 206 would break
+    its Content-Range.
+    """
+
+    def __init__(self, app: ASGIApp, skip_prefixes: Sequence[str], **kwargs):
+        super().__init__(app, **kwargs)
+        self.skip_prefixes = tuple(prefix.rstrip("/") + "/" for prefix in skip_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    StaticFiles for the uploads directory.
+
+    - Adds immutable Cache-Control so browsers and CDNs never revalidate
+    - Answers single-range requests with 206 (conditional requests are
+      handled by StaticFiles itself via ETag/Last-Modified)
+    - With accel_prefix set, returns an empty response carrying
+      X-Accel-Redirect so nginx streams the file and Python never touches
+      the bytes
+    """
+
+    def __init__(self, *args, max_age: int, accel_prefix: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL.format(max_age=max_age)
+        self.accel_prefix = accel_prefix.rstrip("/") if accel_prefix else None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if self.accel_prefix is None:
+            return await super().get_response(path, scope)
+
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        normalized = os.path.normpath(path).replace(os.sep, "/")
+        if normalized.startswith("..") or os.path.isabs(normalized):
+            raise HTTPException(status_code=404)
+        return Response(headers={
+            "X-Accel-Redirect": f"{self.accel_prefix}/{normalized}",
+            "Cache-Control": self.cache_control,
+        })
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = self.cache_control
+        if response.status_code != 200:
+            return response
+
+        response.headers["Accept-Ranges"] = "bytes"
+        request_headers = Headers(scope=scope)
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header is None or (if_range is not None and if_range != response.headers.get("etag")):
+            return response
+
+        byte_range = parse_range(range_header, stat_result.st_size)
+        if byte_range is None:
+            return response
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key.lower() not in ("content-length",)
+        }
+        return PartialFileResponse(
+            str(full_path), *byte_range, stat_result.st_size, headers, scope["method"]
+        )
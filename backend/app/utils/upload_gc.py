@@ -0,0 +1,223 @@
+"""
+Garbage collection of upload files no longer referenced by any document
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+from app.config import settings
+from app.database import get_database
+from app.utils.image_processor import UPLOAD_URL_PREFIX, resolve_app_path
+import asyncio
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents point at uploads via image_url/image_variants
+REFERENCING_COLLECTIONS = ("projects", "clients")
+
+# "<content key>-<width>.<ext>" -> content key, whose manifest is "<content key>.json"
+_VARIANT_NAME = re.compile(r"^(?P<key>[0-9a-f]{64})-\d+\.\w+$")
+
+
+@dataclass
+class SweepReport:
+    """Outcome of one sweep"""
+    dry_run: bool
+    scanned: int = 0
+    referenced: int = 0
+    in_grace_period: int = 0
+    orphaned: int = 0
+    deleted: int = 0
+    freed_bytes: int = 0
+    orphans: List[str] = field(default_factory=list)
+    truncated: bool = False
+    duration_seconds: float = 0.0
+
+
+def _relative_upload_path(url) -> Optional[str]:
+    if isinstance(url, str) and url.startswith(UPLOAD_URL_PREFIX):
+        return url[len(UPLOAD_URL_PREFIX):]
+    return None
+
+
+async def referenced_upload_paths() -> Set[str]:
+    """
+    Paths (relative to UPLOAD_DIR) referenced by any document.
+
+    The manifest of a content key is referenced whenever one of its
+    variants is, so a reused upload still finds its stored variants.
+    """
+    db = get_database()
+    referenced = set()
+    for collection in REFERENCING_COLLECTIONS:
+        cursor = db[collection].find(
+            {}, {"image_url": 1, "image_variants": 1}
+        ).batch_size(settings.EXPORT_BATCH_SIZE)
+        async for document in cursor:
+            urls = [document.get("image_url")]
+            for files in (document.get("image_variants") or {}).values():
+                urls.extend(files.values())
+            for url in urls:
+                path = _relative_upload_path(url)
+                if path:
+                    referenced.add(path)
+
+    for path in list(referenced):
+        directory, name = os.path.split(path)
+        match = _VARIANT_NAME.match(name)
+        if match:
+            referenced.add(f"{directory}/{match.group('key')}.json".lstrip("/"))
+    return referenced
+
+
+def _scan_uploads(upload_dir: str):
+    """Yield (relative path, size, mtime) for every file below upload_dir"""
+    for root, directories, files in os.walk(upload_dir):
+        # Dotfiles (.gitkeep) are not uploads
+        directories[:] = [name for name in directories if not name.startswith(".")]
+        for name in files:
+            if name.startswith("."):
+                continue
+            full_path = os.path.join(root, name)
+            try:
+                stat_result = os.stat(full_path)
+            except OSError:
+                continue
+            relative = os.path.relpath(full_path, upload_dir).replace(os.sep, "/")
+            yield relative, stat_result.st_size, stat_result.st_mtime
+
+
+def _orphans(upload_dir: str, referenced: Set[str], grace_seconds: float, report: SweepReport):
+    cutoff = time.time() - grace_seconds
+    orphans = []
+    for relative, size, mtime in _scan_uploads(upload_dir):
+        report.scanned += 1
+        if relative in referenced:
+            report.referenced += 1
+        elif mtime > cutoff:
+            # Possibly written by a request or job that has not stored its document yet
+            report.in_grace_period += 1
+        else:
+            orphans.append((relative, size))
+    # Manifests first, so a new upload of the same image re-renders instead of reusing half-deleted variants
+    orphans.sort(key=lambda orphan: (not orphan[0].endswith(".json"), orphan[0]))
+    return orphans
+
+
+def _remove(upload_dir: str, relative: str, grace_seconds: float) -> bool:
+    full_path = os.path.join(upload_dir, *relative.split("/"))
+    try:
+        # Re-checked right before deleting: since the scan, an upload of the same
+        # image may have reused (touched) or re-rendered this content-addressed file
+        if os.stat(full_path).st_mtime > time.time() - grace_seconds:
+            return False
+        os.remove(full_path)
+    except FileNotFoundError:
+        return False
+    # Drop emptied shard directories, never the upload root itself
+    directory = os.path.dirname(full_path)
+    while os.path.normpath(directory) != os.path.normpath(upload_dir):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+    return True
+
+
+class UploadSweeper:
+    """
+    Periodic task deleting upload files that no document references.
+
+    Each sweep lists the referenced paths from Mongo, walks UPLOAD_DIR and
+    deletes files that are unreferenced and older than the grace period,
+    checking the age again right before each delete.
+    Deletes are capped per sweep and spaced out to a maximum rate so a
+    large backlog is worked off gradually instead of hammering the disk.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        grace_seconds: float,
+        max_deletes: int,
+        deletes_per_second: float,
+    ):
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self.max_deletes = max_deletes
+        self.deletes_per_second = deletes_per_second
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """Start the periodic sweep"""
+        if self._task is not None or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._loop(), name="upload-sweeper")
+        logger.info(f"Upload sweeper started, running every {self.interval}s")
+
+    async def stop(self):
+        """Cancel the periodic sweep; a sweep cut short simply resumes next time"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def sweep(self, dry_run: bool = False) -> SweepReport:
+        """
+        Reconcile UPLOAD_DIR against the documents.
+
+        Args:
+            dry_run: Only report what would be deleted
+
+        Returns:
+            SweepReport: Counts plus the orphaned paths (up to the per-sweep cap)
+        """
+        async with self._lock:
+            started = time.monotonic()
+            report = SweepReport(dry_run=dry_run)
+            upload_dir = resolve_app_path(settings.UPLOAD_DIR)
+
+            # Referenced set is read before the scan: a file written after this
+            # point is younger than the grace period and left alone
+            referenced = await referenced_upload_paths()
+            orphans = await asyncio.to_thread(
+                _orphans, upload_dir, referenced, self.grace_seconds, report
+            )
+            report.orphaned = len(orphans)
+            report.truncated = len(orphans) > self.max_deletes
+            orphans = orphans[:self.max_deletes]
+            report.orphans = [relative for relative, _ in orphans]
+
+            if not dry_run:
+                delay = 1 / self.deletes_per_second if self.deletes_per_second > 0 else 0
+                for relative, size in orphans:
+                    if await asyncio.to_thread(_remove, upload_dir, relative, self.grace_seconds):
+                        report.deleted += 1
+                        report.freed_bytes += size
+                    if delay:
+                        await asyncio.sleep(delay)
+                if report.deleted:
+                    logger.info(f"Upload sweeper deleted {report.deleted} files ({report.freed_bytes} bytes)")
+
+            report.duration_seconds = round(time.monotonic() - started, 3)
+            return report
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping uploads: {e}")
+
+
+upload_sweeper = UploadSweeper(
+    interval=settings.UPLOAD_GC_INTERVAL_SECONDS,
+    grace_seconds=settings.UPLOAD_GC_GRACE_SECONDS,
+    max_deletes=settings.UPLOAD_GC_MAX_DELETES,
+    deletes_per_second=settings.UPLOAD_GC_DELETES_PER_SECOND,
+)
@@ -0,0 +1,284 @@
+"""
+Write-behind buffer: journal documents locally, insert them into Mongo in batches
+"""
+from typing import Dict, List, Optional
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.database import get_collection
+from app.utils.image_processor import resolve_app_path
+import asyncio
+import glob
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _append_journal(journal_file, lines: List[str]) -> None:
+    journal_file.write("".join(lines))
+    journal_file.flush()
+    os.fsync(journal_file.fileno())
+
+
+def _lock_journal(journal_file, blocking: bool = True) -> None:
+    """Lock a journal exclusively; OSError if another process holds it and blocking is False"""
+    # POSIX only, imported here so the app still imports where write-behind is not used
+    import fcntl
+    flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+    fcntl.flock(journal_file.fileno(), flags)
+
+
+def _rewrite_journal(journal_file, lines: List[str]) -> None:
+    # In place, so the lock held on the open file stays valid
+    journal_file.seek(0)
+    journal_file.truncate()
+    _append_journal(journal_file, lines)
+
+
+def _read_journal(journal_file) -> List[dict]:
+    journal_file.seek(0)
+    documents = []
+    for line in journal_file:
+        if not line.strip():
+            continue
+        try:
+            documents.append(json_util.loads(line))
+        except ValueError:
+            # A line cut short by a crash mid-write was never acknowledged
+            logger.warning(f"Skipping truncated line in {journal_file.name}")
+    return documents
+
+
+def _adopt_journals(directory: str, own_path: str) -> List[dict]:
+    """
+    Read and remove journals left behind by processes that are gone.
+
+    A live process holds an exclusive lock on its journal, so only
+    journals nobody holds can be adopted.
+    """
+    documents = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        if path == own_path:
+            continue
+        with open(path, "r+", encoding="utf-8") as journal_file:
+            try:
+                _lock_journal(journal_file, blocking=False)
+            except OSError:
+                continue
+            documents.extend(_read_journal(journal_file))
+            os.remove(path)
+    return documents
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledge writes once they are journaled to local disk, insert them later.
+
+    Each accepted document gets a client-generated _id, is appended to a
+    per-process JSONL journal and fsynced before submit() returns. A
+    background task flushes pending documents with insert_many(ordered=False)
+    when batch_size is reached or every flush_interval seconds. Duplicate-key
+    errors on flush mean the document is already stored (e.g. replayed after
+    a crash), so they count as success. The journal is append-only: stored
+    documents stay in it until a flush finds that at least half of its
+    entries are stored, and then it is rewritten with what is still pending,
+    so compaction costs O(1) per document. At start, this process' own journal
+    (left by a previous run with the same pid) and journals of dead
+    processes are replayed, and stop() flushes what is left.
+
+    The queue is bounded: when max_pending documents are waiting, submit()
+    answers 503 with Retry-After instead of letting the backlog grow.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        directory: str,
+        max_pending: int,
+        batch_size: int,
+        flush_interval: float,
+    ):
+        self.collection = collection
+        self.directory = directory
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[ObjectId, dict] = {}
+        self._journaling = 0
+        self._journal_path: Optional[str] = None
+        self._journal_file = None
+        self._journal_entries = 0
+        self._journal_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of documents not yet stored in Mongo"""
+        return len(self._pending)
+
+    async def start(self):
+        """Open this process' journal, adopt orphaned journals and start flushing"""
+        if self._task is not None:
+            return
+        directory = resolve_app_path(self.directory)
+        os.makedirs(directory, exist_ok=True)
+        self._journal_path = os.path.join(directory, f"{self.collection}-{os.getpid()}.jsonl")
+        self._journal_file = open(self._journal_path, "a+", encoding="utf-8")
+        _lock_journal(self._journal_file)
+
+        # The pid comes back after a restart (uvicorn is PID 1 in the container),
+        # so this journal may still hold what the previous run acknowledged
+        recovered = await asyncio.to_thread(_read_journal, self._journal_file)
+        for document in recovered:
+            self._pending[document["_id"]] = document
+        self._journal_entries = len(recovered)
+        if recovered:
+            logger.info(f"Replaying {len(recovered)} {self.collection} documents from {self._journal_path}")
+
+        adopted = await asyncio.to_thread(_adopt_journals, directory, self._journal_path)
+        if adopted:
+            for document in adopted:
+                self._pending[document["_id"]] = document
+            await asyncio.to_thread(
+                _append_journal, self._journal_file, [json_util.dumps(document) + "\n" for document in adopted]
+            )
+            self._journal_entries += len(adopted)
+            logger.info(f"Replaying {len(adopted)} journaled {self.collection} documents")
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name=f"write-behind-{self.collection}")
+        if self._pending:
+            self._wakeup.set()
+
+    async def stop(self):
+        """Stop the flush task and flush everything still pending"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        try:
+            await self._flush_pending(drain=True)
+        except Exception as e:
+            logger.error(f"Error flushing {self.collection} on shutdown: {e}")
+        if self._pending:
+            logger.warning(f"{len(self._pending)} {self.collection} documents left in {self._journal_path}")
+        self._journal_file.close()
+        self._journal_file = None
+        if not self._pending:
+            os.remove(self._journal_path)
+
+    async def submit(self, document: dict) -> dict:
+        """
+        Durably queue a document for insertion.
+
+        Args:
+            document: Validated document; an _id is assigned if missing
+
+        Returns:
+            dict: The document as it will be stored
+
+        Raises:
+            HTTPException: 503 when the buffer is full
+        """
+        # Submissions still being journaled count too, or a burst would overshoot the bound
+        if len(self._pending) + self._journaling >= self.max_pending:
+            retry_after = max(1, math.ceil(self.flush_interval))
+            raise HTTPException(
+                status_code=503,
+                detail="Too many pending submissions, please retry shortly",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        document.setdefault("_id", ObjectId())
+        line = json_util.dumps(document) + "\n"
+        self._journaling += 1
+        try:
+            async with self._journal_lock:
+                await asyncio.to_thread(_append_journal, self._journal_file, [line])
+                self._journal_entries += 1
+                self._pending[document["_id"]] = document
+        finally:
+            self._journaling -= 1
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return document
+
+    async def flush(self) -> bool:
+        """
+        Insert up to batch_size pending documents.
+
+        Returns:
+            bool: False if Mongo could not be reached, the batch stays pending
+        """
+        async with self._flush_lock:
+            batch = list(self._pending.values())[:self.batch_size]
+            if not batch:
+                return True
+
+            failed_ids = set()
+            try:
+                await get_collection(self.collection).insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                failed = [
+                    error for error in e.details.get("writeErrors", [])
+                    if error.get("code") != DUPLICATE_KEY_ERROR
+                ]
+                if failed:
+                    logger.error(f"Failed to insert {len(failed)} of {len(batch)} {self.collection} documents: {failed[0].get('errmsg')}")
+                    failed_ids = {batch[error["index"]]["_id"] for error in failed}
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} {self.collection} documents: {e}")
+                return False
+
+            async with self._journal_lock:
+                for document in batch:
+                    if document["_id"] in failed_ids:
+                        # Retried after the rest of the queue instead of blocking it
+                        self._pending[document["_id"]] = self._pending.pop(document["_id"])
+                    else:
+                        self._pending.pop(document["_id"], None)
+                # Entries of stored documents are only replayed as duplicates after a crash;
+                # compact once they make up half the journal, which an empty queue always does
+                if self._journal_entries >= 2 * len(self._pending):
+                    lines = [json_util.dumps(document) + "\n" for document in self._pending.values()]
+                    await asyncio.to_thread(_rewrite_journal, self._journal_file, lines)
+                    self._journal_entries = len(lines)
+            return True
+
+    async def _flush_pending(self, drain: bool):
+        # One pass over the queue at most, so documents Mongo keeps rejecting cannot spin this
+        for _ in range(math.ceil(len(self._pending) / self.batch_size)):
+            if not await self.flush():
+                break
+            if not drain and len(self._pending) < self.batch_size:
+                break
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._flush_pending(drain=False)
+            except Exception as e:
+                logger.error(f"Error flushing {self.collection}: {e}")
+
+
+contact_buffer = WriteBehindBuffer(
+    collection="contacts",
+    directory=settings.CONTACT_BUFFER_DIR,
+    max_pending=settings.CONTACT_BUFFER_MAX_PENDING,
+    batch_size=settings.CONTACT_BUFFER_BATCH_SIZE,
+    flush_interval=settings.CONTACT_BUFFER_FLUSH_SECONDS,
+)
@@ -0,0 +1,315 @@
+"""
+Throughput and latency of every API router, in process
+
+Drives the FastAPI app through httpx's ASGI transport, so requests go
+through the full middleware stack and lifespan without a server or
+network. The database is the in-memory stand-in (benchmarks/memory_mongo.py)
+unless --mongo-uri points at a real mongod, in which case a dedicated
+database (--database) is dropped and reseeded before and dropped after.
+
+Each scenario is warmed up, then sent --requests times from --concurrency
+concurrent callers; the report gives req/s and p50/p95/p99 latency. With
+--save-baseline the results are written to benchmarks/baselines/; otherwise
+they are compared with the stored baseline, and the run fails (exit 1) when
+a scenario's p95 grows or its throughput drops by more than --threshold,
+or when any request gets an unexpected status.
+
+Usage (from backend/):
+    python benchmarks/api.py [--requests 500] [--concurrency 10] [--routers projects,seed]
+    python benchmarks/api.py --save-baseline
+    python benchmarks/api.py --mongo-uri mongodb://localhost:27017 --save-baseline
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+ROUTERS = ("projects", "clients", "homepage", "contact", "newsletter", "admin", "seed")
+
+# The app's default database; never dropped by the benchmark, nor is DATABASE_NAME from .env/env
+PROTECTED_DATABASE = "ufm_db"
+
+ADMIN_CREDENTIALS = {
+    "username": os.getenv("ADMIN_USERNAME", "admin"),
+    "password": os.getenv("ADMIN_PASSWORD", "admin123"),
+}
+
+
+@dataclass
+class Scenario:
+    router: str
+    name: str
+    method: str
+    path: str
+    status: int = 200
+    admin: bool = False
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Request body for the n-th request, for writes that must not collide
+    body: Optional[Callable[[int], dict]] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.router}.{self.name}"
+
+
+def build_scenarios(ids: dict, etags: dict) -> List[Scenario]:
+    """Every scenario, seed last as it replaces the projects and clients"""
+    return [
+        Scenario("projects", "list", "GET", "/api/projects"),
+        Scenario("projects", "list_not_modified", "GET", "/api/projects", 304,
+                 headers={"If-None-Match": etags["projects"]}),
+        Scenario("projects", "list_fields", "GET", "/api/projects?fields=name,image_url&limit=50"),
+        Scenario("projects", "get", "GET", f"/api/projects/{ids['projects']}"),
+        Scenario("clients", "list", "GET", "/api/clients"),
+        Scenario("clients", "get", "GET", f"/api/clients/{ids['clients']}"),
+        Scenario("homepage", "get", "GET", "/api/homepage"),
+        Scenario("contact", "create", "POST", "/api/contact", body=lambda n: {
+            "full_name": f"Benchmark {n}",
+            "email": f"contact{n}@example.com",
+            "mobile_number": "+1 555 0100",
+            "city": "Springfield",
+        }),
+        Scenario("contact", "admin_list", "GET", "/api/admin/contacts", admin=True),
+        Scenario("newsletter", "subscribe", "POST", "/api/newsletter",
+                 body=lambda n: {"email": f"subscriber{n}@example.com"}),
+        Scenario("newsletter", "subscribe_repeat", "POST", "/api/newsletter",
+                 body=lambda n: {"email": "subscriber0@example.com"}),
+        Scenario("newsletter", "admin_list", "GET", "/api/admin/newsletters", admin=True),
+        Scenario("admin", "login", "POST", "/api/admin/auth/login", body=lambda n: ADMIN_CREDENTIALS),
+        Scenario("admin", "verify", "GET", "/api/admin/auth/verify", admin=True),
+        Scenario("seed", "populate", "POST", "/api/seed/populate"),
+        Scenario("seed", "reset", "POST", "/api/seed/reset"),
+    ]
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int, warmup: int, token: str) -> dict:
+    """Send a scenario's requests from concurrent callers and summarize their latencies"""
+    headers = dict(scenario.headers)
+    if scenario.admin:
+        headers["Authorization"] = f"Bearer {token}"
+    sequence = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def call(record: bool) -> None:
+        nonlocal errors
+        body = scenario.body(next(sequence)) if scenario.body else None
+        started = time.perf_counter()
+        try:
+            response = await client.request(scenario.method, scenario.path, json=body, headers=headers)
+            ok = response.status_code == scenario.status
+        except Exception as e:
+            logging.getLogger(__name__).error(f"{scenario.key}: {e}")
+            ok = False
+        if record:
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    async def caller(count: int) -> None:
+        for _ in range(count):
+            await call(record=True)
+
+    for _ in range(warmup):
+        await call(record=False)
+
+    shares = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(caller(share) for share in shares if share))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "router": scenario.router,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Scenarios whose p95 or throughput regressed by more than threshold"""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{key}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+        if result["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{key}: throughput {before['rps']:.0f} -> {result['rps']:.0f} req/s")
+    return regressions
+
+
+def print_report(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    print(f"{'scenario':30} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'p95 vs base':>12}")
+    for key, result in results.items():
+        before = baseline.get(key)
+        delta = f"{(result['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%" if before and before["p95_ms"] else ""
+        print(
+            f"{key:30} {result['rps']:9.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+            f"{result['p99_ms']:8.2f} {result['errors']:6d} {delta:>12}"
+        )
+
+
+def configure_environment(mongo_uri: Optional[str], scratch_dir: str) -> None:
+    """Settings are read at import time, so this runs before the app is imported"""
+    os.environ["UPLOAD_DIR"] = os.path.join(scratch_dir, "uploads")
+    os.environ["CONTACT_BUFFER_DIR"] = os.path.join(scratch_dir, "contact_buffer")
+    os.environ["PROFILE_DIR"] = os.path.join(scratch_dir, "profiles")
+    # Every request comes from the same client; the limiter would answer most with 429
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if mongo_uri:
+        os.environ["MONGODB_URI"] = mongo_uri
+
+
+async def seed(database, items: int) -> dict:
+    """Insert the benchmark dataset, returning the id of one document per collection"""
+    from app.models.client import Client
+    from app.models.project import Project
+    from serialization import make_documents
+
+    ids = {}
+    for name, model in (("projects", Project), ("clients", Client)):
+        documents = make_documents(model, items)
+        await database[name].insert_many(documents)
+        ids[name] = str(documents[len(documents) // 2]["_id"])
+    return ids
+
+
+async def main(args) -> int:
+    backend = "mongod" if args.mongo_uri else "memory"
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"api-{backend}.json")
+    routers = args.routers.split(",") if args.routers else list(ROUTERS)
+    unknown = set(routers) - set(ROUTERS)
+    if unknown:
+        print(f"Unknown routers: {', '.join(sorted(unknown))}. Allowed: {', '.join(ROUTERS)}")
+        return 2
+
+    scratch = tempfile.TemporaryDirectory(prefix="api-benchmark-")
+    configure_environment(args.mongo_uri, scratch.name)
+    logging.basicConfig(level=logging.WARNING)
+
+    import httpx
+    from app.config import settings
+
+    # Loaded before it is overridden below: the database this environment's app would use
+    if args.mongo_uri and args.database in (PROTECTED_DATABASE, settings.DATABASE_NAME):
+        print(f"Refusing to drop {args.database}, the app's database; pick another --database")
+        scratch.cleanup()
+        return 2
+
+    from app.database import db, get_database
+    from app.main import app
+    from memory_mongo import MemoryClient
+
+    # The app's own startup configures logging at INFO; one line per request would swamp the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.mongo_uri:
+        settings.DATABASE_NAME = args.database
+    else:
+        db.client = MemoryClient()
+
+    results: Dict[str, dict] = {}
+    async with app.router.lifespan_context(app):
+        if args.mongo_uri:
+            await db.client.drop_database(args.database)
+        try:
+            ids = await seed(get_database(), args.items)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                login = await client.post("/api/admin/auth/login", json=ADMIN_CREDENTIALS)
+                token = login.json()["access_token"]
+                etags = {"projects": (await client.get("/api/projects")).headers["ETag"]}
+                for scenario in build_scenarios(ids, etags):
+                    if scenario.router in routers:
+                        results[scenario.key] = await run_scenario(
+                            client, scenario, args.requests, args.concurrency, args.warmup, token
+                        )
+        finally:
+            if args.mongo_uri:
+                await db.client.drop_database(args.database)
+    scratch.cleanup()
+
+    meta = {
+        "backend": backend,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "items": args.items,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    }
+
+    baseline: Dict[str, dict] = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as baseline_file:
+            stored = json.load(baseline_file)
+        mismatched = [
+            name for name in ("backend", "requests", "concurrency", "items")
+            if stored["meta"].get(name) != meta[name]
+        ]
+        if mismatched:
+            print(f"Baseline {baseline_path} was taken with different {', '.join(mismatched)}; not comparing")
+        else:
+            baseline = stored["results"]
+
+    print(f"backend: {backend}, {args.requests} requests per scenario, concurrency {args.concurrency}")
+    print_report(results, baseline)
+
+    errors = [key for key, result in results.items() if result["errors"]]
+    if errors:
+        print(f"\nUnexpected responses in: {', '.join(errors)}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        # Scenarios not run this time (--routers) keep their stored results
+        with open(baseline_path, "w", encoding="utf-8") as baseline_file:
+            json.dump({"meta": meta, "results": {**baseline, **results}}, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"\nBaseline written to {baseline_path}")
+        return 1 if errors else 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+    elif baseline:
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 1 if errors or regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--items", type=int, default=100, help="projects and clients to seed")
+    parser.add_argument("--routers", help=f"comma-separated subset of {','.join(ROUTERS)}")
+    parser.add_argument("--mongo-uri", help="benchmark against this mongod instead of memory")
+    parser.add_argument("--database", default="ufm_benchmark", help="database used (and dropped) with --mongo-uri")
+    parser.add_argument("--baseline", help="baseline file (default: benchmarks/baselines/api-<backend>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p95/throughput regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
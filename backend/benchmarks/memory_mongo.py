@@ -0,0 +1,391 @@
+"""
+In-memory stand-in for the Motor client, for benchmarks
+
+Implements the part of the Motor API the app uses (find/find_one with
+projections, sort, limit and async iteration; inserts, updates, upserts,
+deletes, bulk_write; unique indexes) on plain dicts, so the API can be
+benchmarked without a mongod. Documents are deep-copied in and out, as the
+driver would (de)serialize them. Not supported: update pipelines (the
+"mongo" rate-limit store), aggregation and change streams, which raise
+like a standalone mongod does so the app falls back to polling.
+
+Install it before the app connects:
+
+    from app.database import db
+    db.client = MemoryClient()
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+import copy
+
+DUPLICATE_KEY_ERROR = 11000
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def _get(document: dict, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _compare(value, operator: str, argument) -> bool:
+    if value is None:
+        return False
+    try:
+        if operator == "$gt":
+            return value > argument
+        if operator == "$gte":
+            return value >= argument
+        if operator == "$lt":
+            return value < argument
+        return value <= argument
+    except TypeError:
+        # Mongo only compares values of the same type bracket
+        return False
+
+
+def _matches_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return value == condition
+    for operator, argument in condition.items():
+        if operator in ("$gt", "$gte", "$lt", "$lte"):
+            if not _compare(value, operator, argument):
+                return False
+        elif operator == "$ne":
+            if value == argument:
+                return False
+        elif operator == "$in":
+            if value not in argument:
+                return False
+        elif operator == "$nin":
+            if value in argument:
+                return False
+        elif operator == "$exists":
+            if (value is not None) != bool(argument):
+                return False
+        else:
+            raise NotImplementedError(f"Query operator {operator} is not supported in memory")
+    return True
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    """Whether a document satisfies a query filter"""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif not _matches_condition(_get(document, key), condition):
+            return False
+    return True
+
+
+def apply_update(document: dict, update: dict, inserting: bool = False) -> None:
+    """Apply update operators to a document in place"""
+    if isinstance(update, list):
+        raise NotImplementedError("Update pipelines are not supported in memory")
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserting):
+            document.update(copy.deepcopy(fields))
+        elif operator == "$setOnInsert":
+            continue
+        elif operator == "$inc":
+            for name, amount in fields.items():
+                document[name] = document.get(name, 0) + amount
+        elif operator == "$unset":
+            for name in fields:
+                document.pop(name, None)
+        else:
+            raise NotImplementedError(f"Update operator {operator} is not supported in memory")
+
+
+def project(document: dict, projection: Optional[dict]) -> dict:
+    """Copy of a document limited to an inclusion projection"""
+    if not projection:
+        return copy.deepcopy(document)
+    included = {name for name, include in projection.items() if include}
+    result = {name: copy.deepcopy(value) for name, value in document.items() if name in included or name == "_id"}
+    if projection.get("_id") == 0:
+        result.pop("_id", None)
+    return result
+
+
+class MemoryCursor:
+    """Lazily evaluated find() result"""
+
+    def __init__(self, collection: "MemoryCollection", query: dict, projection: Optional[dict]):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key, direction: int = 1) -> "MemoryCursor":
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _results(self) -> List[dict]:
+        documents = self.collection._select(self.query)
+        for key, direction in reversed(self._sort):
+            documents.sort(
+                key=lambda document: (_get(document, key) is not None, _get(document, key)),
+                reverse=direction == -1,
+            )
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [project(document, self.projection) for document in documents]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = self._results()
+        return results[:length] if length else results
+
+    async def explain(self) -> dict:
+        # Rough planner: an index scan when the sort key or first filter key leads an index
+        fields = [key for key, _ in self._sort] or list(self.query)
+        stage = "IXSCAN" if fields and fields[0] in self.collection._leading_fields() else "COLLSCAN"
+        return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": stage}}}}
+
+    def __aiter__(self):
+        self._iterator = iter(self._results())
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    """One collection: documents by _id, in insertion order"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Any, dict] = {}
+        self._indexes: Dict[str, dict] = {}
+
+    def with_options(self, **options) -> "MemoryCollection":
+        return self
+
+    def _leading_fields(self) -> set:
+        return {"_id"} | {next(iter(index["key"])) for index in self._indexes.values()}
+
+    def _select(self, query: Optional[dict]) -> List[dict]:
+        query = query or {}
+        document_id = query.get("_id")
+        if len(query) == 1 and document_id is not None and not isinstance(document_id, dict):
+            document = self._documents.get(document_id)
+            return [document] if document is not None else []
+        return [document for document in self._documents.values() if matches(document, query)]
+
+    def _check_unique(self, document: dict, ignore_id=None) -> None:
+        for name, index in self._indexes.items():
+            if not index.get("unique"):
+                continue
+            fields = list(index["key"])
+            values = [_get(document, field) for field in fields]
+            for other in self._documents.values():
+                if other["_id"] != ignore_id and [_get(other, field) for field in fields] == values:
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {name}", DUPLICATE_KEY_ERROR)
+
+    def _insert(self, document: dict) -> Any:
+        document.setdefault("_id", ObjectId())
+        if document["_id"] in self._documents:
+            raise DuplicateKeyError("E11000 duplicate key error index: _id_", DUPLICATE_KEY_ERROR)
+        self._check_unique(document)
+        self._documents[document["_id"]] = copy.deepcopy(document)
+        return document["_id"]
+
+    def _update(self, document: dict, update: dict) -> None:
+        updated = copy.deepcopy(document)
+        apply_update(updated, update)
+        self._check_unique(updated, ignore_id=document["_id"])
+        self._documents[document["_id"]] = updated
+
+    def _upsert(self, query: dict, update: dict) -> dict:
+        document = {
+            key: value for key, value in query.items()
+            if not key.startswith("$") and not isinstance(value, dict)
+        }
+        apply_update(document, update, inserting=True)
+        self._insert(document)
+        return document
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **options) -> MemoryCursor:
+        return MemoryCursor(self, query or {}, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **options):
+        documents = self._select(query)
+        return project(documents[0], projection) if documents else None
+
+    async def insert_one(self, document: dict, **options):
+        return SimpleNamespace(inserted_id=self._insert(document), acknowledged=True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True, **options):
+        inserted_ids, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY_ERROR, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted_ids)})
+        return SimpleNamespace(inserted_ids=inserted_ids, acknowledged=True)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, **options):
+        documents = self._select(query)
+        if documents:
+            self._update(documents[0], update)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=self._upsert(query, update)["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: dict, update: dict, **options):
+        documents = self._select(query)
+        for document in documents:
+            self._update(document, update)
+        return SimpleNamespace(matched_count=len(documents), modified_count=len(documents), upserted_id=None)
+
+    async def find_one_and_update(
+        self,
+        query: dict,
+        update: dict,
+        projection: Optional[dict] = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        **options,
+    ):
+        documents = self._select(query)
+        if documents:
+            before = documents[0]
+            self._update(before, update)
+            result = self._documents[before["_id"]] if return_document == ReturnDocument.AFTER else before
+            return project(result, projection)
+        if upsert:
+            document = self._upsert(query, update)
+            return project(document, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def delete_one(self, query: dict, **options):
+        documents = self._select(query)
+        if documents:
+            del self._documents[documents[0]["_id"]]
+        return SimpleNamespace(deleted_count=len(documents[:1]))
+
+    async def delete_many(self, query: dict, **options):
+        documents = self._select(query)
+        for document in documents:
+            del self._documents[document["_id"]]
+        return SimpleNamespace(deleted_count=len(documents))
+
+    async def count_documents(self, query: dict, **options) -> int:
+        return len(self._select(query))
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **options):
+        counts = {"inserted_count": 0, "matched_count": 0, "modified_count": 0, "deleted_count": 0}
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    counts["inserted_count"] += 1
+                elif isinstance(request, UpdateOne):
+                    result = await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+                    counts["matched_count"] += result.matched_count
+                    counts["modified_count"] += result.modified_count
+                elif isinstance(request, DeleteOne):
+                    counts["deleted_count"] += (await self.delete_one(request._filter)).deleted_count
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported in memory")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY_ERROR, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+        return SimpleNamespace(acknowledged=True, **counts)
+
+    async def create_indexes(self, models: list, **options) -> List[str]:
+        for model in models:
+            index = dict(model.document)
+            self._indexes[index["name"]] = index
+        return [model.document["name"] for model in models]
+
+
+class MemoryDatabase:
+    """Collections created on first access, like Mongo's"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **options) -> MemoryCollection:
+        return self[name]
+
+    def watch(self, pipeline=None, **options):
+        raise OperationFailure(
+            "The $changeStream stage is only supported on replica sets", CHANGE_STREAMS_UNSUPPORTED
+        )
+
+    async def command(self, command, **options) -> dict:
+        return {"ok": 1.0}
+
+
+class MemoryClient:
+    """Stand-in for AsyncIOMotorClient"""
+
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def get_database(self, name: str, **options) -> MemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    async def drop_database(self, name: str) -> None:
+        self._databases.pop(name, None)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,112 @@
+"""
+Per-item cost of turning Mongo documents into a JSON list response
+
+Compares the previous path (model per document, then FastAPI validating
+against response_model and encoding with stdlib json) with the fast path
+(DocumentSerializer rows encoded straight to bytes).
+
+Usage (from backend/):
+    python benchmarks/serialization.py [--items 1000] [--repeat 20]
+"""
+from datetime import datetime, timedelta
+from typing import List
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+from app.models.client import Client
+from app.models.contact import Contact
+from app.models.newsletter import Newsletter
+from app.models.project import Project
+from app.utils.serialization import DocumentSerializer, dumps, orjson
+
+
+def make_documents(model, count: int) -> List[dict]:
+    now = datetime.utcnow()
+    documents = []
+    for index in range(count):
+        document = {"_id": ObjectId(), "created_at": now - timedelta(minutes=index)}
+        if model in (Project, Client):
+            stem = f"/static/uploads/ab/cd/{index:064x}"
+            document.update({
+                "name": f"Item {index}",
+                "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+                "image_url": f"{stem}-450.jpg",
+                "image_variants": {
+                    fmt: {str(width): f"{stem}-{width}.{ext}" for width in (225, 450, 900)}
+                    for fmt, ext in (("webp", "webp"), ("jpeg", "jpg"))
+                },
+            })
+            if model is Client:
+                document["designation"] = "CEO, Example Inc."
+        elif model is Contact:
+            document.update({
+                "full_name": f"Person {index}",
+                "email": f"person{index}@example.com",
+                "mobile_number": "+1 555 0100",
+                "city": "Springfield",
+            })
+        else:
+            document = {"_id": document["_id"], "email": f"person{index}@example.com", "subscribed_at": now}
+        documents.append(document)
+    return documents
+
+
+async def before(model, field, documents) -> bytes:
+    content = [model(**document) for document in documents]
+    validated = await serialize_response(field=field, response_content=content)
+    return JSONResponse(validated).body
+
+
+async def type_adapter(model, adapter, documents) -> bytes:
+    return adapter.dump_json([model(**document) for document in documents])
+
+
+async def fast(serializer, documents) -> bytes:
+    return dumps(serializer.rows(documents))
+
+
+async def measure(func, repeat: int) -> float:
+    await func()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    return (time.perf_counter() - started) / repeat
+
+
+async def main(items: int, repeat: int):
+    print(f"encoder: {'orjson' if orjson else 'pydantic_core'}, {items} items, mean of {repeat} runs")
+    print(f"{'model':12} {'before µs/item':>15} {'TypeAdapter':>12} {'fast path':>10} {'speedup':>8}")
+    for model in (Project, Client, Contact, Newsletter):
+        documents = make_documents(model, items)
+        field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+        adapter = TypeAdapter(List[model])
+        serializer = DocumentSerializer(model)
+
+        timings = [
+            await measure(lambda: before(model, field, documents), repeat),
+            await measure(lambda: type_adapter(model, adapter, documents), repeat),
+            await measure(lambda: fast(serializer, documents), repeat),
+        ]
+        per_item = [timing / items * 1e6 for timing in timings]
+        print(
+            f"{model.__name__:12} {per_item[0]:15.2f} {per_item[1]:12.2f} {per_item[2]:10.2f} "
+            f"{timings[0] / timings[2]:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.repeat))
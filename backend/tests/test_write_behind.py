@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from app.utils import write_behind
+from app.utils.write_behind import WriteBehindBuffer
+import asyncio
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.inserted = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.inserted.extend(documents)
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents])
+
+
+def make_buffer(directory) -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        collection="contacts",
+        directory=str(directory),
+        max_pending=100,
+        batch_size=100,
+        flush_interval=3600,
+    )
+
+
+def test_restart_with_same_pid_replays_own_journal(tmp_path, monkeypatch):
+    collection = RecordingCollection()
+    monkeypatch.setattr(write_behind, "get_collection", lambda name: collection)
+
+    async def scenario():
+        # First run acknowledges two documents, then dies before flushing
+        first = make_buffer(tmp_path)
+        await first.start()
+        acknowledged = [
+            await first.submit({"email": "a@example.com"}),
+            await first.submit({"email": "b@example.com"}),
+        ]
+        first._task.cancel()
+        await asyncio.gather(first._task, return_exceptions=True)
+        first._journal_file.close()
+
+        # The restarted process gets the same pid, hence the same journal
+        second = make_buffer(tmp_path)
+        await second.start()
+        assert second.pending == 2
+        await second.submit({"email": "c@example.com"})
+        assert await second.flush()
+        await second.stop()
+        return acknowledged
+
+    acknowledged = asyncio.run(scenario())
+    inserted_ids = {document["_id"] for document in collection.inserted}
+    assert {document["_id"] for document in acknowledged} <= inserted_ids
+    assert len(collection.inserted) == 3
+    assert list(tmp_path.glob("*.jsonl")) == []
+
+
+def test_flush_compacts_journal_once_half_is_stored(tmp_path, monkeypatch):
+    collection = RecordingCollection()
+    monkeypatch.setattr(write_behind, "get_collection", lambda name: collection)
+
+    def journal_lines(buffer):
+        with open(buffer._journal_path, encoding="utf-8") as journal_file:
+            return len(journal_file.readlines())
+
+    async def scenario():
+        buffer = make_buffer(tmp_path)
+        await buffer.start()
+        for email in ("a@example.com", "b@example.com", "c@example.com"):
+            await buffer.submit({"email": email})
+        buffer.batch_size = 1
+
+        # One of three stored: the journal is left as it is
+        assert await buffer.flush()
+        assert (buffer.pending, journal_lines(buffer)) == (2, 3)
+        # Two of three stored: rewritten with the one still pending
+        assert await buffer.flush()
+        assert (buffer.pending, journal_lines(buffer)) == (1, 1)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert len(collection.inserted) == 3
+    assert list(tmp_path.glob("*.jsonl")) == []
@@ -70,7 +70,13 @@ function setupAuth() {
 
     const logoutBtn = document.getElementById('logout-btn');
     if (logoutBtn) {
-        logoutBtn.addEventListener('click', () => {
+        logoutBtn.addEventListener('click', async () => {
+            // Revoke the token server-side; log out locally even if that fails
+            try {
+                await api.logout();
+            } catch (error) {
+                console.error('Logout error:', error);
+            }
             api.setToken(null);
             showLoginScreen();
             document.getElementById('login-form').reset();
@@ -83,6 +83,11 @@ class API {
         return this.request('/clients');
     }
 
+    // Projects and clients for the landing page in one request
+    async getHomepage(include = ['projects', 'clients']) {
+        return this.request(`/homepage?include=${include.join(',')}`);
+    }
+
     async submitContact(formData) {
         return this.request('/contact', {
             method: 'POST',
@@ -111,6 +116,12 @@ class API {
         });
     }
 
+    async logout() {
+        return this.request('/admin/auth/logout', {
+            requireAuth: true,
+        });
+    }
+
     // Admin - Projects (uses FormData for file upload)
     async createProject(formData) {
         const url = `${API_BASE_URL}/admin/projects`;
@@ -4,71 +4,79 @@
 const PLACEHOLDER_IMAGE = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='450' height='350' viewBox='0 0 450 350'%3E%3Crect fill='%23ddd' width='450' height='350'/%3E%3Ctext fill='%23999' font-family='Arial' font-size='24' x='50%25' y='50%25' text-anchor='middle' dy='.3em'%3EImage%3C/text%3E%3C/svg%3E";
 
 document.addEventListener('DOMContentLoaded', async () => {
-    await loadProjects();
-    await loadClients();
+    await loadHomepage();
     setupContactForm();
     setupNewsletterForm();
 });
 
-// Load and display projects
-async function loadProjects() {
+// Load projects and clients with a single request
+async function loadHomepage() {
     try {
-        const projects = await api.getProjects();
-        const projectsContainer = document.getElementById('projects-container');
-        
-        if (!projectsContainer) return;
+        const homepage = await api.getHomepage();
+        renderProjects(homepage.projects);
+        renderClients(homepage.clients);
+    } catch (error) {
+        console.error('Error loading homepage:', error);
+        renderProjectsError();
+        renderClientsError();
+    }
+}
 
-        if (projects.length === 0) {
-            projectsContainer.innerHTML = '<div class="empty-state">No projects available.</div>';
-            return;
-        }
+// Display projects
+function renderProjects(projects) {
+    const projectsContainer = document.getElementById('projects-container');
 
-        projectsContainer.innerHTML = projects.map(project => `
-            <div class="project-card">
-                <img src="${project.image_url}" alt="${project.name}" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMAGE}'">
-                <div class="project-info">
-                    <h3>${escapeHtml(project.name)}</h3>
-                    <p>${escapeHtml(project.description)}</p>
-                    <button class="read-more-btn">Read More</button>
-                </div>
+    if (!projectsContainer) return;
+
+    if (projects.length === 0) {
+        projectsContainer.innerHTML = '<div class="empty-state">No projects available.</div>';
+        return;
+    }
+
+    projectsContainer.innerHTML = projects.map(project => `
+        <div class="project-card">
+            ${renderImage(project, '(max-width: 768px) 100vw, 400px')}
+            <div class="project-info">
+                <h3>${escapeHtml(project.name)}</h3>
+                <p>${escapeHtml(project.description)}</p>
+                <button class="read-more-btn">Read More</button>
             </div>
-        `).join('');
-    } catch (error) {
-        console.error('Error loading projects:', error);
-        const projectsContainer = document.getElementById('projects-container');
-        if (projectsContainer) {
-            projectsContainer.innerHTML = '<p>Error loading projects. Please try again later.</p>';
-        }
+        </div>
+    `).join('');
+}
+
+function renderProjectsError() {
+    const projectsContainer = document.getElementById('projects-container');
+    if (projectsContainer) {
+        projectsContainer.innerHTML = '<p>Error loading projects. Please try again later.</p>';
     }
 }
 
-// Load and display clients
-async function loadClients() {
-    try {
-        const clients = await api.getClients();
-        const clientsContainer = document.getElementById('clients-container');
-        
-        if (!clientsContainer) return;
+// Display clients
+function renderClients(clients) {
+    const clientsContainer = document.getElementById('clients-container');
 
-        if (clients.length === 0) {
-            clientsContainer.innerHTML = '<div class="empty-state">No clients available.</div>';
-            return;
-        }
+    if (!clientsContainer) return;
 
-        clientsContainer.innerHTML = clients.map(client => `
-            <div class="client-card">
-                <img src="${client.image_url}" alt="${client.name}" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMAGE}'">
-                <p class="client-description">${escapeHtml(client.description)}</p>
-                <h4 class="client-name">${escapeHtml(client.name)}</h4>
-                <p class="client-designation">${escapeHtml(client.designation)}</p>
-            </div>
-        `).join('');
-    } catch (error) {
-        console.error('Error loading clients:', error);
-        const clientsContainer = document.getElementById('clients-container');
-        if (clientsContainer) {
-            clientsContainer.innerHTML = '<p>Error loading clients. Please try again later.</p>';
-        }
+    if (clients.length === 0) {
+        clientsContainer.innerHTML = '<div class="empty-state">No clients available.</div>';
+        return;
+    }
+
+    clientsContainer.innerHTML = clients.map(client => `
+        <div class="client-card">
+            ${renderImage(client, '140px')}
+            <p class="client-description">${escapeHtml(client.description)}</p>
+            <h4 class="client-name">${escapeHtml(client.name)}</h4>
+            <p class="client-designation">${escapeHtml(client.designation)}</p>
+        </div>
+    `).join('');
+}
+
+function renderClientsError() {
+    const clientsContainer = document.getElementById('clients-container');
+    if (clientsContainer) {
+        clientsContainer.innerHTML = '<p>Error loading clients. Please try again later.</p>';
     }
 }
 
@@ -155,6 +163,24 @@ function setupNewsletterForm() {
 }
 
 // Utility functions
+
+// Render an item's image, with AVIF/WebP sources and srcset when responsive variants exist
+function renderImage(item, sizes) {
+    const fallback = `src="${item.image_url}" alt="${item.name}" loading="lazy" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMAGE}'"`;
+    const variants = item.image_variants;
+    if (!variants || !variants.jpeg) {
+        return `<img ${fallback}>`;
+    }
+
+    const srcset = (files) => Object.entries(files).map(([width, url]) => `${url} ${width}w`).join(', ');
+    const sources = ['avif', 'webp']
+        .filter((format) => variants[format])
+        .map((format) => `<source type="image/${format}" srcset="${srcset(variants[format])}" sizes="${sizes}">`)
+        .join('');
+
+    return `<picture>${sources}<img ${fallback} srcset="${srcset(variants.jpeg)}" sizes="${sizes}"></picture>`;
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;